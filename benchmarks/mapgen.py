@@ -0,0 +1,40 @@
+"""
+Compares the backtracking and vectorized drunkard's walk generators.
+
+Run from the repository root:
+
+    python -m benchmarks.mapgen
+"""
+
+from random import seed
+from timeit import repeat
+
+from gamemap import drunk_walk
+
+SIZES = [(30, 30), (50, 50), (80, 80)]
+COVERAGES = [0.4, 0.5, 0.6]
+RUNS = 5
+
+
+def time_walk(width: int, height: int, coverage: float, fast: bool) -> float:
+    def _build():
+        drunk_walk("bench", "Bench", width, height, coverage, fast=fast)
+
+    return min(repeat(_build, number=1, repeat=RUNS)) * 1000
+
+
+def main():
+    seed(0)
+    print(f"{'size':>8} {'cov':>5} {'classic ms':>11} {'fast ms':>8} {'speedup':>8}")
+    for width, height in SIZES:
+        for cov in COVERAGES:
+            classic = time_walk(width, height, cov, False)
+            fast = time_walk(width, height, cov, True)
+            size = f"{width}x{height}"
+            print(
+                f"{size:>8} {cov:>5.1f} {classic:>11.2f} {fast:>8.2f} {classic / fast:>7.1f}x"  # noqa: E501
+            )
+
+
+if __name__ == "__main__":
+    main()
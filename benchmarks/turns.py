@@ -0,0 +1,114 @@
+"""
+Plays headless games to measure turns per second and the time spent in each
+turn system and in drawing, then builds every level in mapdata.yml at its
+smallest and largest size to measure the memory each one holds.
+
+Run from the repository root:
+
+    python -m benchmarks.turns
+"""
+
+import tracemalloc
+from collections import defaultdict
+from time import perf_counter
+
+from tcod.console import Console
+from tcod.ecs import World
+
+import components as comps
+import factory as fac
+import headless
+import queries as q
+from engine import Engine
+from geom import Point
+from rng import GameRNG
+from screen import ScreenNames
+
+SEEDS = [1, 2, 3]
+TURNS = 1000
+
+
+def time_draws(engine: Engine) -> list[float]:
+    """Wraps the main screen's on_draw so every frame's time is recorded."""
+    screen = engine.screens[ScreenNames.MAIN]
+    on_draw = screen.on_draw
+    times: list[float] = list()
+
+    def _timed(con: Console):
+        t0 = perf_counter()
+        on_draw(con)
+        times.append(perf_counter() - t0)
+
+    screen.on_draw = _timed
+    return times
+
+
+def bench_turns():
+    print(f"{'seed':>4} {'turns':>6} {'secs':>6} {'turns/s':>8} {'level':>7}")
+    totals: dict[str, list[float]] = defaultdict(lambda: [0, 0, 0.0])
+    for seed in SEEDS:
+        engine = headless.start(seed=seed, god_mode=True)
+        systems = engine.screens[ScreenNames.MAIN].systems
+        systems.timed = True
+        draws = time_draws(engine)
+        t0 = perf_counter()
+        taken = headless.play(engine, TURNS, seed, draw=True)
+        secs = perf_counter() - t0
+        engine.shutdown()
+        level = q.cur_map(engine.world).id
+        print(f"{seed:>4} {taken:>6} {secs:>6.2f} {taken / secs:>8.0f} {level:>7}")
+        for s in systems:
+            totals[s.name][0] += s.calls
+            totals[s.name][1] += s.skips
+            totals[s.name][2] += s.secs
+        totals["on_draw"][0] += len(draws)
+        totals["on_draw"][2] += sum(draws)
+
+    print()
+    print(f"{'system':>16} {'calls':>7} {'skips':>7} {'mean ms':>8} {'total s':>8}")
+    for name, (calls, skips, secs) in totals.items():
+        mean = secs / calls * 1000 if calls else 0.0
+        print(f"{name:>16} {calls:>7} {skips:>7} {mean:>8.3f} {secs:>8.2f}")
+
+
+def level_memory(map_id: str, width: int, height: int) -> tuple[int, int]:
+    """Bytes still held after building and viewing a level, and the peak."""
+    w = World()
+    w[None].components[comps.WorldRNG] = GameRNG(0)
+    w[map_id].components[comps.MapPlanComp] = comps.MapPlan(width, height, 0)
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    m = fac.build_map(w, map_id)
+    m.update_cost()
+    m.update_dmap(Point(width // 2, height // 2))
+    m.update_fov(width // 2, height // 2, 8)
+    m.render
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held - base, peak - base
+
+
+def bench_memory():
+    print(
+        f"{'level':>7} {'size':>7} {'cells':>6} {'held KB':>8} {'peak KB':>8} {'B/cell':>7}"  # noqa: E501
+    )
+    for map_id, template in fac.MAPDATA.data.items():
+        sizes = sorted(set(zip(template["width"], template["height"])))
+        for width, height in sizes:
+            held, peak = level_memory(map_id, width, height)
+            cells = width * height
+            size = f"{width}x{height}"
+            print(
+                f"{map_id:>7} {size:>7} {cells:>6} {held / 1024:>8.1f} {peak / 1024:>8.1f} {held / cells:>7.1f}"  # noqa: E501
+            )
+
+
+def main():
+    bench_turns()
+    print()
+    bench_memory()
+
+
+if __name__ == "__main__":
+    main()
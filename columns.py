@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+from dataclasses import fields
+from typing import Any, Callable, Iterable, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from tcod.ecs import Entity
+    from geom import Point
+
+
+def pack_rgb(rgb: Iterable[int]) -> int:
+    r, g, b = rgb
+    return (r << 16) | (g << 8) | b
+
+
+def unpack_rgb(c: int) -> tuple[int, int, int]:
+    c = int(c)
+    return ((c >> 16) & 0xFF, (c >> 8) & 0xFF, c & 0xFF)
+
+
+class ColumnProperty(property):
+    """
+    A component attribute backed by an EntityTable column. While the component
+    is bound to a table, it reads and writes its row in col; otherwise it uses
+    the component's own dataclass field. That field is only brought up to date
+    when the component is unbound, so it is stale while bound.
+    """
+
+    def __init__(
+        self, col: str, field: str, *, store: Callable = int, load: Callable = int
+    ):
+        self.col = col
+        self.field = field
+        self.store = store
+        self.load = load
+        super().__init__(self.__get, self.__set)
+
+    def __set_name__(self, owner: type, name: str):
+        self.name = name
+
+    def __get(self, obj: Columnar) -> Any:
+        table = obj.__dict__.get("_table")
+        if table is None:
+            return obj.__dict__[self.field]
+        return self.load(table.cols[self.col][obj.__dict__["_row"]])
+
+    def __set(self, obj: Columnar, value: Any):
+        table = obj.__dict__.get("_table")
+        if table is None:
+            obj.__dict__[self.field] = value
+        else:
+            table.cols[self.col][obj.__dict__["_row"]] = self.store(value)
+
+
+class Columnar:
+    """
+    Mixin for dataclass components whose hot attributes are ColumnProperty
+    attributes, each declared next to the private field that holds its value
+    while the component isn't bound to a table. Subclasses are declared with
+    eq=False and repr=False so these read the properties, not the stale fields.
+    """
+
+    _columns: tuple[ColumnProperty, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._columns = tuple(
+            v for v in vars(cls).values() if isinstance(v, ColumnProperty)
+        )
+
+    def bind(self, table: EntityTable, row: int):
+        for c in self._columns:
+            table.cols[c.col][row] = c.store(self.__dict__[c.field])
+        self.__dict__["_table"] = table
+        self.__dict__["_row"] = row
+
+    def unbind(self):
+        table = self.__dict__.pop("_table", None)
+        row = self.__dict__.pop("_row", None)
+        if table is None:
+            return
+
+        for c in self._columns:
+            self.__dict__[c.field] = c.load(table.cols[c.col][row])
+
+    def __items(self) -> list[tuple[str, Any]]:
+        by_field = {c.field: c for c in self._columns}
+        items = list()
+        for f in fields(self):
+            c = by_field.get(f.name)
+            items.append(
+                (c.name, c.fget(self)) if c else (f.name, getattr(self, f.name))
+            )
+        return items
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.__items() == other.__items()
+
+    def __repr__(self) -> str:
+        args = ", ".join(f"{k}={v!r}" for k, v in self.__items())
+        return f"{type(self).__name__}({args})"
+
+
+class EntityTable:
+    """
+    Struct-of-arrays store for the hot data of every renderable entity on one
+    map. Living actors bind their Actor, Combatant and Renderable; items and
+    corpses bind only their Renderable. Bound components keep their usual
+    attributes, while systems can work on whole columns at once.
+    """
+
+    DTYPES = {
+        "energy": np.int32,
+        "speed": np.int32,
+        "hp": np.int32,
+        "x": np.int32,
+        "y": np.int32,
+        "z": np.int32,
+        "glyph": np.int32,
+        "color": np.int32,
+    }
+
+    def __init__(self, capacity: int = 16):
+        self.cols = {
+            name: np.zeros(capacity, dtype=dt) for name, dt in self.DTYPES.items()
+        }
+        self.used = np.zeros(capacity, dtype=bool)
+        self.bound = {name: np.zeros(capacity, dtype=bool) for name in self.DTYPES}
+        self.__rows: dict[Entity, int] = dict()
+        self.__ents: list[Entity] = [None] * capacity
+        self.__views: dict[Entity, tuple[Columnar, ...]] = dict()
+
+    def __contains__(self, e: Entity) -> bool:
+        return e in self.__rows
+
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+    def __grow(self):
+        extra = len(self.used)
+        for name, col in self.cols.items():
+            self.cols[name] = np.concatenate([col, np.zeros(extra, col.dtype)])
+            self.bound[name] = np.concatenate([self.bound[name], np.zeros(extra, bool)])
+        self.used = np.concatenate([self.used, np.zeros(extra, bool)])
+        self.__ents.extend([None] * extra)
+
+    def add(self, e: Entity, pt: Point, views: Iterable[Columnar]):
+        if e in self.__rows:
+            self.remove(e)
+
+        free = np.flatnonzero(~self.used)
+        if len(free) == 0:
+            self.__grow()
+            free = np.flatnonzero(~self.used)
+
+        row = int(free[0])
+        self.used[row] = True
+        self.__rows[e] = row
+        self.__ents[row] = e
+        self.__views[e] = tuple(v for v in views if v is not None)
+        for v in self.__views[e]:
+            v.bind(self, row)
+            for c in v._columns:
+                self.bound[c.col][row] = True
+        self.bound["x"][row] = self.bound["y"][row] = True
+        self.move(e, pt)
+
+    def remove(self, e: Entity):
+        row = self.__rows.pop(e, None)
+        if row is None:
+            return
+
+        for v in self.__views.pop(e):
+            v.unbind()
+        self.used[row] = False
+        for b in self.bound.values():
+            b[row] = False
+        self.__ents[row] = None
+
+    def move(self, e: Entity, pt: Point):
+        row = self.__rows.get(e)
+        if row is not None:
+            self.cols["x"][row] = pt.x
+            self.cols["y"][row] = pt.y
+
+    def entities(self, rows: np.ndarray) -> list[Entity]:
+        return [self.__ents[r] for r in rows]
+
+    def mask(self, es: Iterable[Entity]) -> np.ndarray:
+        m = np.zeros(len(self.used), dtype=bool)
+        m[[self.__rows[e] for e in es if e in self.__rows]] = True
+        return m
+
+    def gain_energy(self, ticks: int = 1, stalled: Iterable[Entity] = ()):
+        """Every actor not stalled gains its speed in energy, ticks times over."""
+        gaining = self.bound["energy"] & ~self.mask(stalled)
+        energy = self.cols["energy"]
+        energy[gaining] += self.cols["speed"][gaining] * ticks
+
+    def fallen(self) -> list[Entity]:
+        """Actors at 0 HP or below."""
+        rows = np.flatnonzero(self.bound["hp"] & (self.cols["hp"] <= 0))
+        return self.entities(rows)
+
+    def render_rows(self) -> np.ndarray:
+        """Rows with a bound Renderable, lowest z first."""
+        rows = np.flatnonzero(self.bound["glyph"])
+        return rows[np.argsort(self.cols["z"][rows], kind="stable")]
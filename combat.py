@@ -1,8 +1,9 @@
 from dataclasses import dataclass
-from random import randint
+from random import Random
 from tcod.ecs import Entity
 
-import components as comps
+import queries as q
+import random
 
 
 @dataclass(frozen=True)
@@ -11,36 +12,38 @@ class AttackResult:
     margin: int
 
 
-def d(sides, num=1) -> int:
+def d(sides, num=1, rng: Random = None) -> int:
+    rng = rng or random
     acc = 0
     for _ in range(num):
-        acc += randint(1, sides)
+        acc += rng.randint(1, sides)
 
     return acc
 
 
-def pct() -> int:
-    return d(100)
+def pct(rng: Random = None) -> int:
+    return d(100, rng=rng)
 
 
-def pct_chance(chance: int) -> bool:
-    return d(100) <= chance
+def pct_chance(chance: int, rng: Random = None) -> bool:
+    return d(100, rng=rng) <= chance
 
 
-def bump_attack(attacker: Entity, defender: Entity) -> AttackResult:
-    atk_stat = attacker.components[comps.Combatant].atp
-    def_stat = defender.components[comps.Combatant].dfp
+def bump_attack(attacker: Entity, defender: Entity, rng: Random = None) -> AttackResult:
+    atk_stat = q.stats(attacker).base_atp
+    def_stat = q.stats(defender).base_dfp
 
-    roll = pct()
+    roll = pct(rng)
     target = (atk_stat * (100 - def_stat)) // 100
     raw_margin = target - roll
     hit = raw_margin > 0
     return AttackResult(hit, abs(raw_margin))
 
 
-def gauss_roll(low: int, high: int) -> int:
+def gauss_roll(low: int, high: int, rng: Random = None) -> int:
+    rng = rng or random
     acc = 0
     for _ in range(3):
-        acc += randint(low, high)
+        acc += rng.randint(low, high)
 
     return acc // 3
@@ -3,32 +3,43 @@ from typing import Tuple
 from geom import Point
 from tcod.ecs import Entity
 from gamemap import GameMap
+from columns import ColumnProperty, Columnar, EntityTable, pack_rgb, unpack_rgb
+from schedule import TurnSchedule
+from messagelog import MessageLog
+from rng import GameRNG
 
 import effects
 
 
-@dataclass
-class Renderable:
+@dataclass(eq=False, repr=False)
+class Renderable(Columnar):
     """Describes a renderable object."""
 
-    glyph: str
-    color: Tuple[int, int, int]
-    z: int = 4
+    _glyph: str
+    _color: Tuple[int, int, int]
+    _z: int = 4
 
+    glyph = ColumnProperty("glyph", "_glyph", store=ord, load=chr)
+    color = ColumnProperty("color", "_color", store=pack_rgb, load=unpack_rgb)
+    z = ColumnProperty("z", "_z")
 
-@dataclass
-class Actor:
+
+@dataclass(eq=False, repr=False)
+class Actor(Columnar):
     """Describes an entity that can take actions."""
 
-    energy: int
-    speed: int
+    _energy: int
+    _speed: int
 
+    energy = ColumnProperty("energy", "_energy")
+    speed = ColumnProperty("speed", "_speed")
 
-@dataclass
-class Combatant:
+
+@dataclass(eq=False, repr=False)
+class Combatant(Columnar):
     """Describes an entity that can fight."""
 
-    cur_hp: int
+    _cur_hp: int
     base_max_hp: int
     at: int
     df: int
@@ -37,6 +48,8 @@ class Combatant:
     ag: int
     wl: int
 
+    cur_hp = ColumnProperty("hp", "_cur_hp")
+
     @property
     def dmg_str(self) -> str:
         low, high = self.dmg
@@ -90,6 +103,23 @@ class Combatant:
         self.cur_hp -= amt
 
 
+@dataclass(frozen=True)
+class EffectiveStats:
+    """
+    A combatant's derived stats, kept until its equipment, level or effects
+    change. atp, dfp and reduction include equipment; the base_ stats don't.
+    """
+
+    atp: int
+    dfp: int
+    reduction: int
+    dmg: Tuple[int, int]
+    max_hp: int
+    base_atp: int
+    base_dfp: int
+    wl_mod: int
+
+
 @dataclass(frozen=True)
 class GameMessage:
     """Describes a game message."""
@@ -145,19 +175,31 @@ class Level:
         self.xp = start_xp
 
 
+@dataclass
+class MapPlan:
+    """A map reserved by a connection but not generated until first entered."""
+
+    width: int
+    height: int
+    seed: int
+
+
 # Named components - global Entity
-Messages = ("messages", list[GameMessage])
+Messages = ("messages", MessageLog)
 GameVersion = ("game_version", str)
 GameSaved = ("game_saved", bool)
 GameFileName = ("game_file_name", str)
 GameTurn = ("game_turn", int)
 GameTicks = ("game_ticks", int)
+DirtyLayers = ("dirty_layers", set[str])
+WorldRNG = ("world_rng", GameRNG)
 
 # Named components
 Name = ("name", str)
 BumpAttacking = ("bump_attacking", Entity)
 CollidesWith = ("collides_with", Entity)
-EffectsList = ("effect_list", list[effects.GameEffect])
+Effects = ("effects", effects.ActiveEffects)
+EffectiveStatsComp = ("effective_stats", EffectiveStats)
 CheckOnHits = ("check_on_hits", Entity)
 Location = ("location", Point)
 TryMove = ("try_move", Point)
@@ -165,8 +207,15 @@ FullName = ("full_name", str)
 Description = ("desc", str)
 InventoryMax = ("inv_max", int)
 GameMapComp = ("game_map", GameMap)
+MapPlanComp = ("map_plan", MapPlan)
+MapSchedule = ("map_schedule", TurnSchedule)
+MapEntities = ("map_entities", EntityTable)
 SelfUseItem = ("self_use_item", Entity)
 
+# Tags
+HasEffects = "has_effects"
+Headless = "headless"
+
 # Relation tags
 HostileTo = "hostile_to"
 HeldBy = "held_by"
@@ -182,8 +231,11 @@ DamagedBy = "damaged_by"
 # Relation components
 @dataclass(frozen=True)
 class MapConnection:
-    """Describes the connection points between two maps."""
+    """
+    Describes the connection points between two maps. up_stair is None
+    until the map below is generated.
+    """
 
     map_id: str
     down_stair: Point
-    up_stair: Point
+    up_stair: Point | None
@@ -1,4 +1,14 @@
 SAVING = True
-VERSION = "0.7.02"
+VERSION = "0.7.06"
 DEBUG = False
+DMAP_RADIUS = 20
+UPKEEP_TICK = 5
+AUTOSAVE_TURNS = 100
+MAPGEN_WORKERS = 1
 FIBO = [0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89]
+LOG_LEVEL = 10  # gamelog.LogLevels.DEBUG
+LOG_MUTED = []
+LOG_BUFFER = 512
+LOG_FLUSH_SECS = 2.0
+PROFILING = DEBUG
+PROFILE_WINDOW = 300
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 from tcod.ecs import Entity
+from typing import Iterator
 from updates import add_msg_about
 
 import components as comps
 import combat as cbt
+import queries as q
 
 
 class GameEffect:
@@ -52,6 +54,31 @@ class GameEffect:
         return f"{self.name}{addendum}"
 
 
+class ActiveEffects:
+    """An entity's effects by name, in the order they were first applied."""
+
+    def __init__(self):
+        self.__by_name: dict[str, GameEffect] = dict()
+
+    def __len__(self) -> int:
+        return len(self.__by_name)
+
+    def __iter__(self) -> Iterator[GameEffect]:
+        return iter(self.__by_name.values())
+
+    def __contains__(self, eff_name: str) -> bool:
+        return eff_name in self.__by_name
+
+    def get(self, eff_name: str) -> GameEffect | None:
+        return self.__by_name.get(eff_name)
+
+    def add(self, eff: GameEffect):
+        self.__by_name[eff.name] = eff
+
+    def remove(self, eff_name: str) -> GameEffect | None:
+        return self.__by_name.pop(eff_name, None)
+
+
 class BleedEffect(GameEffect):
     """Describes damage over time caused by bleeding."""
 
@@ -114,7 +141,7 @@ class LightningEffect(GameEffect):
     def on_apply(self, e: Entity):
         low = max(0, self.potency - 3)
         high = self.potency + 3
-        dmg = cbt.gauss_roll(low, high)
+        dmg = cbt.gauss_roll(low, high, q.world_rng(e.world).combat)
         e.components[comps.Combatant].damage(dmg)
         add_msg_about(e, f"<entity> is struck by lightning for {dmg} damage!")
 
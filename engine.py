@@ -1,42 +1,61 @@
 import os
-import pickle
 import tcod
 import factory as fac
 import components as comps
 
 from tcod.ecs import World
 from gamelog import dump_log
-from queries import map_connections
+from profiler import PROFILER
+from savefile import Autosaver, write_save
+from rng import GameRNG
+from queries import map_connections, messages
+from messagelog import MessageLog
 from screens.gameoverscreen import GameOverScreen
 from screen import Screen, ScreenNames
 from screens import MainScreen, TitleScreen, TestUIScreen, WinScreen
-from ui import SCR_W, SCR_H
-from constants import SAVING, VERSION
+from ui import SCR_W, SCR_H, MSG_W, draw_profile
+from constants import MAPGEN_WORKERS, SAVING, VERSION
 from datetime import datetime
 
 
 class Engine:
-    """Holds the game state and data."""
-
-    def __init__(self):
-        tileset = tcod.tileset.load_tilesheet(
-            "./assets/gfx/Sir_Henrys_32x32.png",
-            16,
-            16,
-            tcod.tileset.CHARMAP_CP437,
-        )
+    """
+    Holds the game state and data.
+    A headless engine opens no window and writes nothing to disk: no saves,
+    logs or profiles. Screens still draw to the root console, it just isn't
+    presented.
+    """
+
+    def __init__(self, headless: bool = False):
+        self.headless = headless
         self.screens: dict[str, Screen] = dict()
         self.cur_scr_name = ""
-        self.context = tcod.context.new(
-            columns=SCR_W, rows=SCR_H, tileset=tileset, vsync=True
-        )
+        self.context: tcod.context.Context = None
+        if not headless:
+            tileset = tcod.tileset.load_tilesheet(
+                "./assets/gfx/Sir_Henrys_32x32.png",
+                16,
+                16,
+                tcod.tileset.CHARMAP_CP437,
+            )
+            self.context = tcod.context.new(
+                columns=SCR_W, rows=SCR_H, tileset=tileset, vsync=True
+            )
         self.world = World()
         self.root = tcod.console.Console(SCR_W, SCR_H, order="F")
         self.should_update = True
         self.running = True
+        self.show_profile = False
+        self.autosaver = Autosaver()
+        self.prefetcher = fac.MapPrefetcher(MAPGEN_WORKERS)
+
+    @property
+    def saving(self) -> bool:
+        return SAVING and not self.headless
 
     def __del__(self):
-        self.context.close()
+        if self.context is not None:
+            self.context.close()
 
     @property
     def cur_screen(self) -> Screen:
@@ -51,10 +70,11 @@ class Engine:
         self.cur_screen.on_enter()
 
     def setup(self):
-        if not os.path.exists("saves/"):
-            os.mkdir("saves")
-        if not os.path.exists("logs/"):
-            os.mkdir("logs")
+        if not self.headless:
+            if not os.path.exists("saves/"):
+                os.mkdir("saves")
+            if not os.path.exists("logs/"):
+                os.mkdir("logs")
 
         for sc in [MainScreen, TitleScreen, TestUIScreen, GameOverScreen, WinScreen]:
             self._register_sc(sc(self))
@@ -63,18 +83,25 @@ class Engine:
 
     def input(self):
         for evt in tcod.event.wait():
-            self.context.convert_event(evt)
-            self.cur_screen.dispatch(evt)
+            with PROFILER.timed("engine.input"):
+                self.context.convert_event(evt)
+                self.cur_screen.dispatch(evt)
 
     def update(self):
         if self.should_update:
-            self.cur_screen.on_update()
+            with PROFILER.timed("engine.update"):
+                self.cur_screen.on_update()
             self.should_update = False
 
     def draw(self):
-        self.root.clear()
-        self.cur_screen.on_draw(self.root)
-        self.context.present(self.root)
+        with PROFILER.timed("engine.draw"):
+            self.root.clear()
+            self.cur_screen.on_draw(self.root)
+            if self.show_profile:
+                draw_profile(PROFILER, self.root)
+        if self.context is not None:
+            with PROFILER.timed("engine.present"):
+                self.context.present(self.root)
 
     def run(self):
         while self.running:
@@ -85,47 +112,62 @@ class Engine:
         self.shutdown()
 
     def save_game(self):
-        if SAVING:
+        if self.saving:
             save_file = self.world[None].components.get(comps.GameFileName)
             if save_file:
-                with open(f"saves/{save_file}.sav", "wb") as f:
-                    pickle.dump(self.world, f)
+                self.autosaver.wait(self.world)
+                write_save(self.world, f"saves/{save_file}.sav")
+
+    def autosave(self):
+        if self.saving:
+            save_file = self.world[None].components.get(comps.GameFileName)
+            if save_file:
+                self.autosaver.save(self.world, f"saves/{save_file}.sav")
 
     def load_game(self, world: World):
         if SAVING:
+            self.prefetcher.shutdown()
             self.world = world
             self.setup_screens()
 
-    def new_game(self, hero_id: str):
+    def new_game(self, hero_id: str, seed: int = None):
+        self.prefetcher.shutdown()
         now = datetime.now()
         world = World()
-        world[None].components[comps.Messages] = list()
+        world[None].components[comps.WorldRNG] = GameRNG(seed)
+        game_file = f"{hero_id}-{(now.strftime('%Y%m%d_%H%M%S'))}"
+        world[None].components[comps.Messages] = MessageLog(
+            MSG_W - 2, None if self.headless else f"logs/{game_file}.txt"
+        )
         world[None].components[comps.GameVersion] = VERSION
         world[None].components[comps.GameSaved] = False
-        world[None].components[
-            comps.GameFileName
-        ] = f"{hero_id}-{(now.strftime('%Y%m%d_%H%M%S'))}"
+        world[None].components[comps.GameFileName] = game_file
         world[None].components[comps.GameTicks] = 0
         world[None].components[comps.GameTurn] = 0
+        if self.headless:
+            world[None].tags.add(comps.Headless)
         player = fac.make_char(world, hero_id, player=True)
-        fac.build_all_maps(world)
+        fac.build_map(world, "town", self.prefetcher)
         fac.place_entity(world, player, "town")
-        fac.populate_all_maps(world)
-        fac.connect_all_maps(world)
         self.world = world
         self.setup_screens()
 
     def dump_game_file(self):
-        game_file = self.world[None].components[comps.GameFileName]
-        msgs = self.world[None].components[comps.Messages]
+        messages(self.world).flush()
+
+    def dump_profile(self):
+        if not PROFILER.enabled:
+            return
 
-        with open(f"logs/{game_file}.txt", "w") as fl:
-            msg_list = [f"{msg.message}\n" for msg in msgs]
-            fl.writelines(msg_list)
+        game_file = self.world[None].components.get(comps.GameFileName, "game")
+        PROFILER.dump_csv(f"logs/{game_file}-profile.csv")
 
     def shutdown(self):
-        dump_log(self.world)
-        self.dump_game_file()
+        self.prefetcher.shutdown()
+        if not self.headless:
+            dump_log(self.world)
+            self.dump_game_file()
+            self.dump_profile()
         self.save_game()
 
     def setup_screens(self):
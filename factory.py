@@ -1,14 +1,22 @@
-from random import choices, randint
+from random import Random, getrandbits
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Callable, Literal
 from tcod.ecs import World, Entity
-from queries import blockers_at, items_at, get_map
+from dataclasses import replace
+from queries import get_map, world_rng
+from updates import change_map
 from geom import Point
 from yaml import load, SafeLoader
 from gamemap import GameMap, arena, drunk_walk
+from schedule import TurnSchedule
+from columns import EntityTable
+from profiler import PROFILER
 
 import components as comps
 import effects
 import gamelog as gl
+import multiprocessing
 
 
 class GameData:
@@ -76,7 +84,7 @@ def make_char(
         comps.Renderable: comps.Renderable(glyph, color, z),
         comps.Location: Point(0, 0),
         comps.Actor: comps.Actor(-100, speed),
-        comps.EffectsList: list(),
+        comps.Effects: effects.ActiveEffects(),
     }
 
     if not any(s is None for s in [hp, atp, dfp, dmg, st, ag, wl]):
@@ -120,7 +128,7 @@ def make_char(
         e.relation_tags_many[comps.HostileTo].add("enemy")
         e.components[comps.Level] = comps.Level()
 
-    gl.write_log(world, "factory", f"Creating character {nm}")
+    gl.write_log(world, "factory", "Creating character {}", nm)
 
     return e
 
@@ -193,67 +201,186 @@ def make_equipment(w: World, build_id: str) -> Entity:
 def add_map(w: World, m: GameMap):
     m_e = w[m.id]
     m_e.components[comps.GameMapComp] = m
+    m_e.components[comps.MapSchedule] = TurnSchedule()
+    m_e.components[comps.MapEntities] = EntityTable()
+
+
+class MapPrefetcher:
+    """
+    Generates planned maps in worker processes ahead of first entry.
+    Workers send back the pickled GameMap, which packs its tiles compactly;
+    the main process still connects and populates it.
+    Workers are spawned rather than forked, so they don't inherit the
+    window or the game log thread.
+    """
+
+    def __init__(self, workers: int, mp_context: str = "spawn"):
+        self.workers = workers
+        self.mp_context = mp_context
+        self.__pool: ProcessPoolExecutor = None
+        self.__jobs: dict[str, tuple[comps.MapPlan, Future]] = dict()
+
+    def submit(self, w: World, map_id: str, plan: comps.MapPlan):
+        """Starts generating a planned map. A broken pool turns prefetching off."""
+        if self.workers <= 0:
+            return
+
+        if self.__pool is None:
+            self.__pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.mp_context),
+            )
+        try:
+            self.__jobs[map_id] = (plan, self.__pool.submit(make_map, map_id, plan))
+        except BrokenProcessPool as err:
+            gl.write_log(
+                w,
+                "factory",
+                "Map prefetching stopped: {!r}",
+                err,
+                level=gl.LogLevels.WARNING,
+            )
+            self.shutdown()
+            self.workers = 0
+
+    def take(self, w: World, map_id: str, plan: comps.MapPlan) -> GameMap | None:
+        """The prefetched map for this plan, or None to generate it here."""
+        job = self.__jobs.pop(map_id, None)
+        if job is None or job[0] != plan:
+            return None
+
+        try:
+            return job[1].result()
+        except Exception as err:
+            gl.write_log(
+                w,
+                "factory",
+                "Prefetching {} failed: {!r}",
+                map_id,
+                err,
+                level=gl.LogLevels.WARNING,
+            )
+            return None
 
+    def shutdown(self):
+        """Drops pending jobs and stops the workers; the next submit restarts them."""
+        self.__jobs.clear()
+        if self.__pool is not None:
+            self.__pool.shutdown(wait=False, cancel_futures=True)
+            self.__pool = None
 
-def connect_map(w: World, m_from: GameMap, m_to: GameMap):
-    e_m_from = w[m_from.id]
-    e_m_to = w[m_to.id]
-    stairs_down = m_from.get_random_floor()
-    stairs_up = m_to.get_random_floor()
+
+def plan_map(w: World, map_id: str) -> comps.MapPlan:
+    """Fixes a map's size and generation seed ahead of generating it."""
+    template = MAPDATA.data[map_id]
+    w_low, w_high = template["width"]
+    h_low, h_high = template["height"]
+    rng = world_rng(w).mapgen
+    width = rng.randint(w_low, w_high)
+    height = rng.randint(h_low, h_high)
+    plan = comps.MapPlan(width, height, rng.getrandbits(32))
+    w[map_id].components[comps.MapPlanComp] = plan
+    return plan
+
+
+def connect_map(w: World, m_from: GameMap, to_id: str, prefetch: MapPrefetcher = None):
+    """
+    Adds stairs down from m_from and plans to_id, which is only generated
+    once something enters it; its up stairs are placed then.
+    """
+    stairs_down = m_from.get_random_floor(world_rng(w).mapgen)
+    plan = plan_map(w, to_id)
+    if prefetch is not None:
+        prefetch.submit(w, to_id, plan)
     m_from.add_down_stair(stairs_down.x, stairs_down.y)
-    m_to.add_up_stair(stairs_up.x, stairs_up.y)
-    e_m_from.relation_components[comps.MapConnection][e_m_to] = comps.MapConnection(
-        m_to.id, stairs_down, stairs_up
+    w[m_from.id].relation_components[comps.MapConnection][w[to_id]] = (
+        comps.MapConnection(to_id, stairs_down, None)
     )
-    gl.write_log(w, "factory", f"Connecting {m_from.id} to {m_to.id}")
+    gl.write_log(w, "factory", "Connecting {} to {}", m_from.id, to_id)
 
 
 def place_entity(w: World, e: Entity, map_id: str, pt: Point = None):
-    m_e = w[map_id]
-    e.relation_tag[comps.MapId] = m_e
-    m = m_e.components[comps.GameMapComp]
-    if pt is None:
-        pt = m.get_random_floor()
-
-    blockers_here = bool(len(list(blockers_at(w, pt))))
-    items_here = bool(len(list(items_at(w, pt))))
-
-    while blockers_here or items_here:
-        pt = m.get_random_floor()
-        blockers_here = bool(len(list(blockers_at(w, pt))))
-        items_here = bool(len(list(items_at(w, pt))))
+    m = ensure_map(w, map_id)
+    if pt is None or m.spatial.is_blocked(pt) or m.spatial.has_items(pt):
+        free = m.sample_floors(1, m.spatial.occupied(), world_rng(w).spawn)
+        if free:
+            pt = free[0]
+        else:
+            if pt is None:
+                pt = m.get_random_floor(world_rng(w).spawn)
+            gl.write_log(
+                w,
+                "factory",
+                "No free floor left in {}; sharing {}",
+                map_id,
+                pt,
+                level=gl.LogLevels.WARNING,
+            )
 
-    e.components[comps.Location] = pt
+    change_map(e, map_id, pt)
 
     gl.write_log(
-        w, "factory", f"Adding entity {e.components[comps.Name]} to {map_id} at {pt}"
+        w,
+        "factory",
+        "Adding entity {} to {} at {}",
+        e,
+        map_id,
+        pt,
     )
 
 
-def build_all_maps(w: World):
-    for map_id in MAPDATA.data.keys():
-        gl.write_log(w, "factory", f"Building map {map_id}")
-        m = make_map(map_id)
-        add_map(w, m)
+@PROFILER.profiled("factory.build_map")
+def build_map(w: World, map_id: str, prefetch: MapPrefetcher = None) -> GameMap:
+    """Generates, connects and populates a map, following its plan if it has one."""
+    gl.write_log(w, "factory", "Building map {}", map_id, level=gl.LogLevels.INFO)
+    plan = w[map_id].components.get(comps.MapPlanComp)
+    m = prefetch.take(w, map_id, plan) if prefetch is not None else None
+    if m is None:
+        m = make_map(map_id, plan, world_rng(w).mapgen)
+    add_map(w, m)
+
+    if plan:
+        _add_up_stair(w, m)
+    downto = MAPDATA.data[map_id].get("downto")
+    if downto:
+        connect_map(w, m, downto, prefetch)
+
+    gl.write_log(w, "factory", "Populating map {}", map_id)
+    populate_map(w, m)
+    return m
 
 
-def populate_all_maps(w: World):
-    for _, m in w.Q[Entity, comps.GameMapComp]:
-        gl.write_log(w, "factory", f"Populating map {m.id}")
-        populate_map(w, m)
+def _add_up_stair(w: World, m: GameMap):
+    """Puts the up stairs on a floor of m and points the way down at them."""
+    up_stair = m.get_random_floor(world_rng(w).mapgen)
+    m.add_up_stair(up_stair.x, up_stair.y)
+    m_e = w[m.id]
+    for e_up in w.Q.all_of(relations=[(comps.MapConnection, m_e)]):
+        conns = e_up.relation_components[comps.MapConnection]
+        conns[m_e] = replace(conns[m_e], up_stair=up_stair)
 
 
-def connect_all_maps(w: World):
-    for map_id, map_data in MAPDATA.data.items():
-        downto = map_data.get("downto")
-        if downto:
-            map_from = get_map(w, map_id)
-            map_to = get_map(w, downto)
-            connect_map(w, map_from, map_to)
+def ensure_map(w: World, map_id: str, prefetch: MapPrefetcher = None) -> GameMap:
+    if comps.GameMapComp not in w[map_id].components:
+        return build_map(w, map_id, prefetch)
+    return get_map(w, map_id)
 
 
-def make_map(build_id: str) -> GameMap:
-    """Creates a map based on map data."""
+def descend(e: Entity, map_id: str, prefetch: MapPrefetcher = None):
+    """Moves e down the stairs to map_id, generating it on first entry."""
+    w = e.world
+    ensure_map(w, map_id, prefetch)
+    conns = e.relation_tag[comps.MapId].relation_components[comps.MapConnection]
+    change_map(e, map_id, conns[w[map_id]].up_stair)
+
+
+@PROFILER.profiled("factory.make_map")
+def make_map(build_id: str, plan: comps.MapPlan = None, rng: Random = None) -> GameMap:
+    """
+    Creates a map based on map data. A planned map gets the planned size and
+    is generated from the plan's seed, so it comes out the same in any process;
+    otherwise rng is used.
+    """
     template = MAPDATA.data[build_id]
     gen = template["gen"]
     w_low, w_high = template["width"]
@@ -262,14 +389,21 @@ def make_map(build_id: str) -> GameMap:
     dark = template.get("dark", False)
     name = template["name"]
 
-    width = randint(w_low, w_high)
-    height = randint(h_low, h_high)
+    if plan:
+        width, height = plan.width, plan.height
+        rng = Random(plan.seed)
+    else:
+        rng = rng or Random(getrandbits(32))
+        width = rng.randint(w_low, w_high)
+        height = rng.randint(h_low, h_high)
     cov = 0.3 + 0.1 * tier
     m = None
 
     match gen:
         case "drunkard":
-            m = drunk_walk(build_id, name, width, height, cov, dark)
+            m = drunk_walk(build_id, name, width, height, cov, dark, rng=rng)
+        case "drunkard_fast":
+            m = drunk_walk(build_id, name, width, height, cov, dark, True, rng)
         case "arena":
             m = arena(build_id, name, width, height, dark)
         case _:
@@ -281,8 +415,10 @@ def make_map(build_id: str) -> GameMap:
 Repo = Literal["monsters", "items", "equips"]
 
 
+@PROFILER.profiled("factory.populate_map")
 def populate_map(w: World, m: GameMap):
     template = MAPDATA.data[m.id]
+    rng = world_rng(w).spawn
 
     def _cands(
         repo: GameData, type_list: list, default_tier: int, tier_list: list = None
@@ -298,14 +434,31 @@ def populate_map(w: World, m: GameMap):
 
     def _popu(tbl: dict, fn: Callable[[World, str], Entity], num: int, repo: Repo):
         if tbl:
-            choice_ids = choices(list(tbl.keys()), list(tbl.values()), k=num)
-
-            for c_id in choice_ids:
+            choice_ids = rng.choices(list(tbl.keys()), list(tbl.values()), k=num)
+            pts = m.sample_floors(num, m.spatial.occupied(), rng)
+            if len(pts) < num:
+                gl.write_log(
+                    w,
+                    "factory",
+                    "Only room for {} of {} {} in map {}; skipping the rest",
+                    len(pts),
+                    num,
+                    repo,
+                    m.id,
+                    level=gl.LogLevels.WARNING,
+                )
+
+            for c_id, pt in zip(choice_ids, pts):
                 thing = fn(w, c_id)
-                place_entity(w, thing, m.id)
+                place_entity(w, thing, m.id, pt)
         else:
             gl.write_log(
-                w, "factory", f"No valid choices for {repo} in map {m.id}; check data"
+                w,
+                "factory",
+                "No valid choices for {} in map {}; check data",
+                repo,
+                m.id,
+                level=gl.LogLevels.WARNING,
             )
 
     tier = template["tier"]
@@ -315,7 +468,7 @@ def populate_map(w: World, m: GameMap):
 
     if monster_data:
         m_low, m_high = monster_data["number"]
-        num_monsters = randint(m_low, m_high)
+        num_monsters = rng.randint(m_low, m_high)
         m_types = monster_data["types"]
         m_tiers = monster_data.get("tiers", list())
         monster_cands = _cands(CHARDATA, m_types, tier, m_tiers)
@@ -323,7 +476,7 @@ def populate_map(w: World, m: GameMap):
 
     if item_data:
         i_low, i_high = item_data["number"]
-        num_items = randint(i_low, i_high)
+        num_items = rng.randint(i_low, i_high)
         i_types = item_data["types"]
         i_tiers = item_data.get("tiers", list())
         item_cands = _cands(ITEMDATA, i_types, tier, i_tiers)
@@ -331,7 +484,7 @@ def populate_map(w: World, m: GameMap):
 
     if equip_data:
         e_low, e_high = equip_data["number"]
-        num_equips = randint(e_low, e_high)
+        num_equips = rng.randint(e_low, e_high)
         e_types = equip_data["types"]
         e_tiers = equip_data.get("tiers", list())
         equip_cands = _cands(EQUIPDATA, e_types, tier, e_tiers)
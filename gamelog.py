@@ -1,21 +1,132 @@
 from __future__ import annotations
-from tcod.ecs import World
-from constants import DEBUG
+from tcod.ecs import World, Entity
+from constants import DEBUG, LOG_LEVEL, LOG_MUTED, LOG_BUFFER, LOG_FLUSH_SECS
+
+import os
+import threading
 import components as comps
 
 
-GAMELOG = list()
+class LogLevels:
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING"}
 
 
-def write_log(w: World, category: str, text: str):
-    if DEBUG:
+class GameLog:
+    """
+    Debug log that buffers lines in memory and appends them to their log
+    files from a background thread, every few seconds or once the buffer
+    fills. If the writer falls behind, the caller flushes instead, so the
+    buffer never grows past twice its capacity.
+    """
+
+    def __init__(self, capacity: int, interval: float):
+        self.capacity = capacity
+        self.interval = interval
+        self.level = LogLevels.DEBUG
+        self.muted: set[str] = set()
+        self.__lines: list[tuple[str, str]] = list()
+        self.__lock = threading.Lock()
+        self.__io_lock = threading.Lock()
+        self.__wake = threading.Event()
+        self.__writer: threading.Thread = None
+
+    def enabled(self, category: str, level: int = LogLevels.DEBUG) -> bool:
+        return DEBUG and level >= self.level and category not in self.muted
+
+    def write(self, path: str, line: str):
+        with self.__lock:
+            self.__lines.append((path, line))
+            pending = len(self.__lines)
+
+        if self.__writer is None:
+            self.__writer = threading.Thread(target=self.__run, daemon=True)
+            self.__writer.start()
+        if pending >= 2 * self.capacity:
+            self.flush()
+        elif pending >= self.capacity:
+            self.__wake.set()
+
+    def flush(self):
+        """
+        Appends the buffered lines to their files. Lines that can't be
+        written are kept for the next flush, newest first, up to capacity.
+        """
+        with self.__io_lock:
+            with self.__lock:
+                lines, self.__lines = self.__lines, list()
+
+            by_path: dict[str, list[str]] = dict()
+            for path, line in lines:
+                by_path.setdefault(path, list()).append(line)
+
+            unwritten: list[tuple[str, str]] = list()
+            for path, batch in by_path.items():
+                try:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    with open(path, "a") as f:
+                        f.writelines(batch)
+                except OSError:
+                    unwritten += [(path, line) for line in batch]
+
+            if unwritten:
+                with self.__lock:
+                    self.__lines[:0] = unwritten
+                    del self.__lines[: -self.capacity]
+
+    def __run(self):
+        while True:
+            self.__wake.wait(self.interval)
+            self.__wake.clear()
+            self.flush()
+
+
+GAMELOG = GameLog(LOG_BUFFER, LOG_FLUSH_SECS)
+GAMELOG.level = LOG_LEVEL
+GAMELOG.muted.update(LOG_MUTED)
+
+
+def log_enabled(category: str, level: int = LogLevels.DEBUG) -> bool:
+    return GAMELOG.enabled(category, level)
+
+
+def set_log_level(level: int):
+    GAMELOG.level = level
+
+
+def mute_log(*categories: str):
+    GAMELOG.muted.update(categories)
+
+
+def unmute_log(*categories: str):
+    GAMELOG.muted.difference_update(categories)
+
+
+def _log_arg(arg):
+    if isinstance(arg, Entity):
+        return arg.components.get(comps.Name, arg)
+    return arg
+
+
+def write_log(w: World, category: str, text: str, *args, level: int = LogLevels.DEBUG):
+    """
+    Logs text under a category when DEBUG is on, level is at or above the
+    log level and the category isn't muted. Headless games are never logged.
+    Any args are only formatted into text, str.format style, if it is logged;
+    entities are written by name.
+    """
+    if GAMELOG.enabled(category, level) and comps.Headless not in w[None].tags:
         game_turn = w[None].components.get(comps.GameTurn, 0)
-        GAMELOG.append(f"[Turn {game_turn}] [{category}] {text}\n")
+        log_file = w[None].components.get(comps.GameFileName, "game")
+        msg = text.format(*map(_log_arg, args)) if args else text
+        lvl = LogLevels.NAMES[level]
+        GAMELOG.write(
+            f"logs/{log_file}.log", f"[Turn {game_turn}] [{lvl}] [{category}] {msg}\n"
+        )
 
 
 def dump_log(w: World):
     if DEBUG:
-        log_file = w[None].components[comps.GameFileName]
-        with open(f"logs/{log_file}.log", "a") as f:
-            f.writelines(GAMELOG)
-        GAMELOG.clear()
+        GAMELOG.flush()
@@ -1,10 +1,12 @@
 from geom import Point, Rect
 from typing import Iterable, Tuple
-from random import choice
+from random import Random, getrandbits
 from tcod.path import maxarray, dijkstra2d
 from tcod.map import compute_fov
 from tcod.constants import FOV_DIAMOND
+from spatial import SpatialIndex
 
+import random
 import swatch as sw
 import numpy as np
 
@@ -30,8 +32,12 @@ def new_tile(
     return np.array((walkable, transparent, dark, light), dtype=tile_dt)
 
 
+TILE_BYTES = np.dtype((np.void, tile_dt.itemsize))
+
 SHROUD = np.array((ord(" "), sw.WHITE, sw.BLACK), dtype=render_dt)
 
+STEPS = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.int32)
+
 
 class GameMap:
     """Describes a game map."""
@@ -51,6 +57,15 @@ class GameMap:
         self.dist = maxarray((width, height), order="F")
         self.cost = np.zeros((width, height), dtype=np.int32, order="F")
         self.dark = dark
+        self.spatial = SpatialIndex()
+        self.__floors: np.ndarray = None
+        self.__base_cost: np.ndarray = None
+        self.__occupied: frozenset[Point] = frozenset()
+        self.__cost_version = 0
+        self.__dmap_key = None
+        self.__fov_key = None
+        self.__fov_box: Tuple[int, int, int, int] = None
+        self.__render: np.ndarray = None
         self.__id = id
         self.__name = name
         self.wall_tile = new_tile(
@@ -79,6 +94,53 @@ class GameMap:
         )
         self.__tiles = np.full((width, height), fill_value=self.wall_tile, order="F")
 
+    def __palette(self) -> list[np.ndarray]:
+        return [
+            self.wall_tile,
+            self.floor_tile,
+            self.stairs_down_tile,
+            self.stairs_up_tile,
+        ]
+
+    def __getstate__(self) -> dict:
+        """
+        Saves keep the tiles as indices into this map's own tile types and
+        explored as packed bits; visibility and every cache are dropped and
+        rebuilt after loading.
+        """
+        state = self.__dict__.copy()
+        kinds = np.zeros(self.__tiles.shape, dtype=np.uint8, order="F")
+        known = np.zeros(self.__tiles.shape, dtype=bool, order="F")
+        # Comparing raw bytes is much faster than field-by-field record equality
+        raw = self.__tiles.view(TILE_BYTES)
+        for i, tile in enumerate(self.__palette()):
+            here = raw == tile.reshape(1).view(TILE_BYTES)[0]
+            kinds[here] = i
+            known |= here
+
+        if known.all():
+            state["_GameMap__tiles"] = kinds
+        state["explored"] = np.packbits(self.explored, axis=None)
+        for attr in ("visible", "dist", "cost"):
+            state[attr] = None
+        for attr in ("floors", "base_cost", "dmap_key", "fov_key", "fov_box", "render"):
+            state[f"_GameMap__{attr}"] = None
+        state["_GameMap__occupied"] = frozenset()
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        shape = self.__tiles.shape
+        if self.__tiles.dtype != tile_dt:
+            palette = np.array(self.__palette(), dtype=tile_dt)
+            self.__tiles = np.asfortranarray(palette[self.__tiles])
+
+        bits = np.unpackbits(self.explored, count=shape[0] * shape[1])
+        self.explored = np.asfortranarray(bits.astype(bool).reshape(shape))
+        self.visible = np.zeros(shape, dtype=bool, order="F")
+        self.dist = maxarray(shape, order="F")
+        self.cost = np.zeros(shape, dtype=np.int32, order="F")
+
     @property
     def id(self) -> str:
         return self.__id
@@ -100,23 +162,134 @@ class GameMap:
         return self.__tiles
 
     def update_cost(self, pts: Iterable[Point] = None):
-        self.cost = np.select(
-            condlist=[self.tiles["walkable"]], choicelist=[1], default=0
-        )
-
-        if pts:
-            for pt in pts:
-                self.cost[pt.x, pt.y] = 10
+        """
+        Walkable cells cost 1 and walls 0; occupied cells cost 10.
+        The walkable layer is cached, so only cells whose occupancy changed
+        since the last call are rewritten.
+        """
+        occupied = frozenset(pts) if pts else frozenset()
+
+        if self.__base_cost is None:
+            self.__base_cost = self.tiles["walkable"].astype(np.int32)
+            self.cost = self.__base_cost.copy(order="F")
+            self.__occupied = frozenset()
+            self.__cost_version += 1
+
+        if occupied == self.__occupied:
+            return
+
+        for pt in self.__occupied - occupied:
+            self.cost[pt.x, pt.y] = self.__base_cost[pt.x, pt.y]
+        for pt in occupied - self.__occupied:
+            self.cost[pt.x, pt.y] = 10
+
+        self.__occupied = occupied
+        self.__cost_version += 1
+
+    def update_dmap(self, *goals: Point, radius: int = None):
+        """
+        Reruns Dijkstra only if the goals or the cost map changed.
+        With a radius, distances are only computed in the box that far around
+        the goals; cells outside it are left unreached.
+        """
+        key = (goals, radius, self.__cost_version)
+        if key == self.__dmap_key:
+            return
+
+        unreached = np.iinfo(self.dist.dtype).max
+        self.dist[...] = unreached
+        if radius is None or not goals:
+            x1, y1, x2, y2 = 0, 0, self.width, self.height
+        else:
+            x1 = max(0, min(g.x for g in goals) - radius)
+            y1 = max(0, min(g.y for g in goals) - radius)
+            x2 = min(self.width, max(g.x for g in goals) + radius + 1)
+            y2 = min(self.height, max(g.y for g in goals) + radius + 1)
 
-    def update_dmap(self, *goals: Point):
-        self.dist = maxarray((self.width, self.height), order="F")
+        window = np.full(
+            (x2 - x1, y2 - y1), unreached, dtype=self.dist.dtype, order="F"
+        )
         for goal in goals:
-            self.dist[goal.x, goal.y] = 0
-        dijkstra2d(self.dist, self.cost, True, out=self.dist)
+            window[goal.x - x1, goal.y - y1] = 0
+        dijkstra2d(window, self.cost[x1:x2, y1:y2], True, out=window)
+        self.dist[x1:x2, y1:y2] = window
+        self.__dmap_key = key
+
+    def reached(self, x: int, y: int) -> bool:
+        """Whether the last distance map got as far as this cell."""
+        return self.dist[x, y] < np.iinfo(self.dist.dtype).max
+
+    def greedy_step(self, start: Point, goal: Point) -> Point | None:
+        """One walkable step that closes the distance to goal, ignoring walls beyond."""
+        dx = goal.x - start.x
+        dy = goal.y - start.y
+        sx = Point(int(np.sign(dx)), 0)
+        sy = Point(0, int(np.sign(dy)))
+        order = [sx, sy] if abs(dx) >= abs(dy) else [sy, sx]
+        for step in order:
+            nxt = start + step
+            if step != Point(0, 0) and self.walkable(nxt.x, nxt.y):
+                return nxt
+
+        return None
+
+    def update_fov(self, x: int, y: int, r: int) -> bool:
+        """
+        Recomputes FOV only when the viewer, radius or tiles changed, and only
+        over the box the radius can reach. Returns whether it was recomputed.
+        """
+        key = (x, y, r)
+        if key == self.__fov_key:
+            return False
+
+        if r > 0:
+            x1, y1 = max(0, x - r), max(0, y - r)
+            x2, y2 = min(self.width, x + r + 1), min(self.height, y + r + 1)
+        else:
+            x1, y1, x2, y2 = 0, 0, self.width, self.height
+
+        # Only the last and the new window can change, so only they are touched
+        ox1, oy1, ox2, oy2 = self.__fov_box or (x1, y1, x2, y2)
+        ux1, uy1 = min(x1, ox1), min(y1, oy1)
+        ux2, uy2 = max(x2, ox2), max(y2, oy2)
+        before = self.visible[ux1:ux2, uy1:uy2].copy()
+
+        self.visible[ox1:ox2, oy1:oy2] = False
+        window = self.tiles["transparent"][x1:x2, y1:y2]
+        self.visible[x1:x2, y1:y2] = compute_fov(
+            window, (x - x1, y - y1), r, FOV_DIAMOND
+        )
+        self.explored[x1:x2, y1:y2] |= self.visible[x1:x2, y1:y2]
+        self.__fov_key = key
+        self.__fov_box = (x1, y1, x2, y2)
+
+        if self.__render is not None and self.dark:
+            changed = before != self.visible[ux1:ux2, uy1:uy2]
+            cx, cy = np.nonzero(changed)
+            self.__paint(cx + ux1, cy + uy1)
+        return True
+
+    def __paint(self, xs: np.ndarray, ys: np.ndarray):
+        tiles = self.tiles[xs, ys]
+        self.__render[xs, ys] = np.select(
+            condlist=[self.visible[xs, ys], self.explored[xs, ys]],
+            choicelist=[tiles["light"], tiles["dark"]],
+            default=SHROUD,
+        )
 
-    def update_fov(self, x: int, y: int, r: int):
-        self.visible = compute_fov(self.tiles["transparent"], (x, y), r, FOV_DIAMOND)
-        self.explored |= self.visible
+    @property
+    def render(self) -> np.ndarray:
+        """
+        What each cell looks like right now: lit, remembered or shrouded.
+        Built once, then repainted by update_fov only where visibility changed.
+        """
+        if self.__render is None:
+            self.__render = np.empty((self.width, self.height), render_dt, order="F")
+            if self.dark:
+                self.__paint(*np.indices((self.width, self.height)))
+            else:
+                self.__render[...] = self.tiles["light"]
+        return self.__render
 
     def in_bounds(self, x: int, y: int) -> bool:
         return 0 <= x < self.width and 0 <= y < self.height
@@ -127,12 +300,29 @@ class GameMap:
     def transparent(self, x: int, y: int) -> bool:
         return self.__tiles[x, y]["transparent"]
 
+    @property
+    def floors(self) -> np.ndarray:
+        """Flat indices of every walkable cell, rebuilt only after the map changes."""
+        if self.__floors is None:
+            self.__floors = np.flatnonzero(self.__tiles["walkable"])
+        return self.__floors
+
+    def invalidate_caches(self):
+        """Drops everything derived from the tiles; call after changing them."""
+        self.__floors = None
+        self.__base_cost = None
+        self.__dmap_key = None
+        self.__fov_key = None
+        self.__render = None
+
     def carve(self, x: int, y: int):
         self.tiles[x, y] = self.floor_tile
+        self.invalidate_caches()
 
     def carve_rect(self, r: Rect):
         self.tiles[r.x1 : r.x2 + 1, r.y1 : r.y2 + 1] = self.wall_tile
         self.tiles[r.x1 + 1 : r.x2, r.y1 + 1 : r.y2] = self.floor_tile
+        self.invalidate_caches()
 
     def neighbors(self, x: int, y: int):
         return [
@@ -143,23 +333,37 @@ class GameMap:
 
     def add_down_stair(self, x: int, y: int):
         self.tiles[x, y] = self.stairs_down_tile
+        self.invalidate_caches()
 
     def add_up_stair(self, x: int, y: int):
         self.tiles[x, y] = self.stairs_up_tile
+        self.invalidate_caches()
 
     def on_edge(self, x: int, y: int) -> bool:
         return x == 0 or x == self.width - 1 or y == 0 or y == self.height - 1
 
-    def get_random_floor(self) -> Point:
-        cands = [
-            Point(x, y)
-            for x in range(0, self.width)
-            for y in range(0, self.height)
-            if self.in_bounds(x, y)
-            if self.walkable(x, y)
-        ]
+    def _to_point(self, idx: int) -> Point:
+        x, y = np.unravel_index(idx, self.__tiles.shape)
+        return Point(int(x), int(y))
 
-        return choice(cands)
+    def get_random_floor(self, rng: Random = None) -> Point:
+        return self._to_point((rng or random).choice(self.floors))
+
+    def sample_floors(
+        self, k: int, exclude: Iterable[Point] = None, rng: Random = None
+    ) -> list[Point]:
+        """
+        Picks up to k distinct floor cells, skipping any in exclude.
+        Returns fewer than k points if the map runs out of room.
+        """
+        cands = self.floors
+        if exclude:
+            xs, ys = zip(*((pt.x, pt.y) for pt in exclude))
+            taken = np.ravel_multi_index((xs, ys), self.__tiles.shape)
+            cands = cands[~np.isin(cands, taken)]
+
+        picks = (rng or random).sample(range(len(cands)), min(k, len(cands)))
+        return [self._to_point(cands[i]) for i in picks]
 
 
 def arena(id: str, name: str, width: int, height: int, dark: bool = True) -> GameMap:
@@ -176,7 +380,10 @@ def drunk_walk(
     height: int,
     coverage: float = 0.5,
     dark: bool = True,
+    fast: bool = False,
+    rng: Random = None,
 ) -> GameMap:
+    rng = rng or Random(getrandbits(32))
     m = GameMap(id, name, width, height, dark)
     x = m.width // 2
     y = m.height // 2
@@ -184,6 +391,13 @@ def drunk_walk(
     stack = [pt]
     floors = 0
     desired = int(width * height * max(0.1, min(coverage, 1)))
+
+    if fast:
+        m.tiles[walk_floors(width, height, desired, rng=rng)] = m.floor_tile
+        m.invalidate_caches()
+        m.update_cost()
+        return m
+
     m.carve(x, y)
 
     def f(pt):
@@ -192,7 +406,7 @@ def drunk_walk(
     while floors < desired:
         cands = list(filter(f, m.neighbors(pt.x, pt.y)))
         if len(cands) > 0:
-            pt = choice(cands)
+            pt = rng.choice(cands)
             m.carve(pt.x, pt.y)
             stack.append(pt)
             floors += 1
@@ -201,3 +415,53 @@ def drunk_walk(
 
     m.update_cost()
     return m
+
+
+def _fold(pos: np.ndarray, low: int, high: int) -> np.ndarray:
+    """Reflects unbounded walk coordinates back into [low, high]."""
+    span = high - low
+    if span == 0:
+        return np.full_like(pos, low)
+    q = (pos - low) % (2 * span)
+    return low + np.where(q <= span, q, 2 * span - q)
+
+
+def walk_floors(
+    width: int, height: int, desired: int, chunk: int = 8192, rng: Random = None
+) -> np.ndarray:
+    """
+    Random walk from the center on a plain boolean grid, carving desired cells
+    past the starting one. Directions are drawn a chunk at a time, and the walk
+    reflects off the map edge instead of stepping onto it.
+    """
+    rng = np.random.default_rng(rng.getrandbits(32) if rng else getrandbits(32))
+    floor = np.zeros((width, height), dtype=bool, order="F")
+    x = width // 2
+    y = height // 2
+    floor[x, y] = True
+    needed = min(desired, (width - 2) * (height - 2) - 1)
+
+    while needed > 0:
+        steps = STEPS[rng.integers(0, len(STEPS), size=chunk)]
+        ux = x + np.cumsum(steps[:, 0])
+        uy = y + np.cumsum(steps[:, 1])
+        xs = _fold(ux, 1, width - 2)
+        ys = _fold(uy, 1, height - 2)
+        fresh = ~floor[xs, ys]
+        carved = np.count_nonzero(floor)
+        floor[xs, ys] = True
+        found = np.count_nonzero(floor) - carved
+
+        if found >= needed:
+            # Uncarve whatever this chunk reached after the last cell needed.
+            idx = np.flatnonzero(fresh)
+            _, first = np.unique(xs[idx] * height + ys[idx], return_index=True)
+            late = np.sort(idx[first])[needed:]
+            floor[xs[late], ys[late]] = False
+            break
+
+        needed -= found
+        x = ux[-1]
+        y = uy[-1]
+
+    return floor
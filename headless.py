@@ -0,0 +1,185 @@
+"""
+Plays the game without a window. An AutoPlayer stands in for the keyboard,
+and the engine's update and draw steps run as they would in Engine.run.
+
+Run from the repository root:
+
+    python headless.py --turns 1000 --seed 1
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+from typing import Callable
+
+import numpy as np
+from tcod.path import dijkstra2d, maxarray
+from tcod.ecs import Entity
+
+import components as comps
+import queries as q
+import updates as u
+from engine import Engine
+from gamemap import GameMap
+from geom import Point, Direction
+from screen import ScreenNames
+from screens import MainScreen
+from screens.mainscreen import GameStates
+
+CHASE_RANGE = 6
+STUCK_TURNS = 3
+DIRS = [Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT]
+
+
+class AutoPlayer:
+    """
+    Plays the main screen through its input handlers: fights visible enemies
+    nearby, otherwise walks to the stairs down and takes them. On the last
+    level it hunts whatever is left, then wanders.
+    """
+
+    def __init__(self, screen: MainScreen, seed: int = None):
+        self.screen = screen
+        self.rng = Random(seed)
+        self.__paths: dict[tuple[str, Point], np.ndarray] = dict()
+        self.__last_pos: Point = None
+        self.__stuck = 0
+
+    def act(self):
+        """Presses one key's worth of input."""
+        scr = self.screen
+        if scr.mode != GameStates.MAIN:
+            scr.on_cancel()
+            return
+
+        pos = q.location(scr.player)
+        self.__stuck = self.__stuck + 1 if pos == self.__last_pos else 0
+        self.__last_pos = pos
+        if self.__stuck >= STUCK_TURNS:
+            self.__step(pos + self.rng.choice(DIRS))
+            return
+
+        m = scr.cur_map
+        target = self.__nearest_enemy(pos, m)
+        if target is not None:
+            self.__step(m.greedy_step(pos, target) or pos)
+            return
+
+        down = q.map_connections(scr.world, m.id)["down"]
+        if down is None:
+            self.__step(pos + self.rng.choice(DIRS))
+        elif m.tiles[pos.x, pos.y] == m.stairs_down_tile:
+            scr.on_confirm()
+        else:
+            stairs = scr.world[m.id].relation_components[comps.MapConnection]
+            self.__step(self.__path_step(pos, stairs[scr.world[down[0]]].down_stair))
+
+    def __nearest_enemy(self, pos: Point, m: GameMap) -> Point | None:
+        """The closest visible enemy in range; ties go to the lowest x, then y."""
+        best, best_key = None, (CHASE_RANGE + 1,)
+        for e in q.entities(self.screen.world, m.id):
+            if not q.is_enemy(e) or q.is_dead(e):
+                continue
+            loc = q.location(e)
+            key = (abs(loc.x - pos.x) + abs(loc.y - pos.y), loc.x, loc.y)
+            if key < best_key and m.visible[loc.x, loc.y]:
+                best, best_key = loc, key
+        return best
+
+    def __path_step(self, pos: Point, goal: Point) -> Point:
+        m = self.screen.cur_map
+        dist = self.__paths.get((m.id, goal))
+        if dist is None:
+            dist = maxarray((m.width, m.height), order="F")
+            dist[goal.x, goal.y] = 0
+            cost = m.tiles["walkable"].astype(np.int32)
+            dijkstra2d(dist, cost, 1, None, out=dist)
+            self.__paths[(m.id, goal)] = dist
+
+        best = pos
+        for d in DIRS:
+            nxt = pos + d
+            if m.in_bounds(nxt.x, nxt.y) and dist[nxt.x, nxt.y] < dist[best.x, best.y]:
+                best = nxt
+        return best
+
+    def __step(self, to: Point):
+        pos = q.location(self.screen.player)
+        keys = {
+            pos + Direction.UP: self.screen.on_up,
+            pos + Direction.DOWN: self.screen.on_down,
+            pos + Direction.LEFT: self.screen.on_left,
+            pos + Direction.RIGHT: self.screen.on_right,
+        }
+        keys.get(to, self.screen.on_wait)()
+
+
+def start(hero_id: str = "rikkas", seed: int = None, god_mode: bool = False):
+    """A headless engine with a new game on the main screen."""
+    engine = Engine(headless=True)
+    engine.setup()
+    engine.new_game(hero_id, seed)
+    engine.switch_screen(ScreenNames.MAIN)
+    if god_mode:
+        stats = engine.world["player"].components[comps.Combatant]
+        stats.base_max_hp = 1_000_000
+        stats.heal()
+        u.invalidate_stats(engine.world["player"])
+    return engine
+
+
+def play(
+    engine: Engine,
+    turns: int,
+    seed: int = None,
+    draw: bool = False,
+    on_turn: Callable[[Engine, int], None] = None,
+) -> int:
+    """
+    Lets an AutoPlayer take up to turns actions and returns how many it took,
+    which is fewer if the player dies or wins first.
+    """
+    bot = AutoPlayer(engine.screens[ScreenNames.MAIN], seed)
+    player: Entity = engine.world["player"]
+    taken = 0
+    while taken < turns and engine.running:
+        if engine.cur_scr_name != ScreenNames.MAIN or q.is_dead(player):
+            break
+
+        bot.act()
+        engine.update()
+        if draw:
+            engine.draw()
+        taken += 1
+        if on_turn:
+            on_turn(engine, taken)
+
+    return taken
+
+
+def main():
+    parser = ArgumentParser(description="Play the game without a window.")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--hero", default="rikkas")
+    parser.add_argument("--draw", action="store_true", help="draw every turn")
+    parser.add_argument("--god", action="store_true", help="the player can't die")
+    args = parser.parse_args()
+
+    engine = start(args.hero, args.seed, args.god)
+    t0 = perf_counter()
+    taken = play(engine, args.turns, args.seed, args.draw)
+    secs = perf_counter() - t0
+    w = engine.world
+    print(
+        f"{taken} turns in {secs:.2f}s ({taken / secs:.0f}/s), "
+        f"ended on {q.cur_map(w).id}, game turn {w[None].components[comps.GameTurn]}, "
+        f"player {'dead' if q.is_dead(w['player']) else 'alive'}"
+    )
+    engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
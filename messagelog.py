@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Iterator, TYPE_CHECKING
+
+import textwrap
+
+if TYPE_CHECKING:
+    from components import GameMessage
+
+
+class MessageLog:
+    """
+    Keeps the most recent game messages, wrapped once for the message pane.
+    Older messages are appended to the game's log file in batches as they
+    fall out of the buffer, so memory and draw cost stay flat.
+    """
+
+    def __init__(self, width: int, path: str = None, capacity: int = 100):
+        self.width = width
+        self.path = path
+        self.__ring: deque[tuple[GameMessage, list[str]]] = deque(maxlen=capacity)
+        self.__unsaved = 0
+
+    def __len__(self) -> int:
+        return len(self.__ring)
+
+    def __iter__(self) -> Iterator[GameMessage]:
+        return (msg for msg, _ in self.__ring)
+
+    def append(self, msg: GameMessage):
+        if self.__unsaved == self.__ring.maxlen:
+            self.flush()
+
+        self.__ring.append((msg, textwrap.wrap(msg.message, self.width)))
+        self.__unsaved += 1
+
+    def latest(self) -> Iterator[tuple[GameMessage, list[str]]]:
+        """Messages newest first, each with its wrapped lines."""
+        return reversed(self.__ring)
+
+    def flush(self):
+        """Writes every message not yet in the log file."""
+        if self.__unsaved == 0:
+            return
+
+        if self.path:
+            unsaved = list(self)[-self.__unsaved :]
+            with open(self.path, "a") as fl:
+                fl.writelines(f"{msg.message}\n" for msg in unsaved)
+        self.__unsaved = 0
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Iterator
+
+from constants import PROFILING, PROFILE_WINDOW
+
+import csv
+import numpy as np
+
+# Upper edges of the histogram buckets, in ms; the last bucket is open-ended.
+BUCKET_EDGES = np.array([0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0])
+
+
+class Histogram:
+    """
+    Timings of the most recent calls to one thing, in milliseconds.
+    Calls and total time also count the calls that have rolled out.
+    """
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.total = 0.0
+        self.__samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self.__samples)
+
+    def add(self, ms: float):
+        self.calls += 1
+        self.total += ms
+        self.__samples.append(ms)
+
+    @property
+    def samples(self) -> np.ndarray:
+        return np.fromiter(self.__samples, float, len(self.__samples))
+
+    def percentile(self, pct: float) -> float:
+        return float(np.percentile(self.samples, pct)) if self.__samples else 0.0
+
+    @property
+    def mean(self) -> float:
+        return float(self.samples.mean()) if self.__samples else 0.0
+
+    @property
+    def max(self) -> float:
+        return max(self.__samples, default=0.0)
+
+    def buckets(self) -> np.ndarray:
+        """How many recent calls fall in each of the BUCKET_EDGES buckets."""
+        idx = np.searchsorted(BUCKET_EDGES, self.samples, side="right")
+        return np.bincount(idx, minlength=len(BUCKET_EDGES) + 1)
+
+
+class Profiler:
+    """Rolling per-call timings, keyed by names like 'system.check_moves'."""
+
+    def __init__(self, window: int, enabled: bool):
+        self.window = window
+        self.enabled = enabled
+        self.histograms: dict[str, Histogram] = dict()
+
+    def record(self, name: str, secs: float):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram(self.window)
+        hist.add(secs * 1000)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - t0)
+
+    def profiled(self, name: str) -> Callable:
+        """Decorator form of timed."""
+
+        def _wrap(fn: Callable) -> Callable:
+            @wraps(fn)
+            def _call(*args, **kwargs):
+                with self.timed(name):
+                    return fn(*args, **kwargs)
+
+            return _call
+
+        return _wrap
+
+    def rows(self) -> list[tuple[str, Histogram]]:
+        return sorted(self.histograms.items())
+
+    def reset(self):
+        self.histograms.clear()
+
+    def dump_csv(self, path: str):
+        if not self.histograms:
+            return
+
+        edges = [f"le_{edge:g}ms" for edge in BUCKET_EDGES]
+        with open(path, "w", newline="") as f:
+            out = csv.writer(f)
+            out.writerow(
+                ["name", "calls", "total_ms", "window", "mean_ms", "p50_ms"]
+                + ["p95_ms", "max_ms"]
+                + edges
+                + [f"gt_{BUCKET_EDGES[-1]:g}ms"]
+            )
+            for name, hist in self.rows():
+                stats = [hist.mean, hist.percentile(50), hist.percentile(95), hist.max]
+                out.writerow(
+                    [name, hist.calls, f"{hist.total:.3f}", len(hist)]
+                    + [f"{ms:.4f}" for ms in stats]
+                    + hist.buckets().tolist()
+                )
+
+
+PROFILER = Profiler(PROFILE_WINDOW, PROFILING)
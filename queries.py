@@ -1,17 +1,21 @@
 from __future__ import annotations
-from functools import reduce
 
 from tcod.ecs import World, Entity
 from tcod.ecs.query import WorldQuery
-from typing import TYPE_CHECKING, Literal, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Literal, Tuple
 from gamemap import GameMap
 from geom import Point
+from spatial import SpatialIndex
 from constants import FIBO
 
 import components as comps
 
 if TYPE_CHECKING:
     from effects import GameEffect
+    from schedule import TurnSchedule
+    from columns import EntityTable
+    from messagelog import MessageLog
+    from rng import GameRNG
 
 
 def player(w: World) -> Entity:
@@ -52,19 +56,42 @@ def cur_map(w: World) -> GameMap:
     return cur_map_e.components[comps.GameMapComp]
 
 
+def schedule(w: World, map_id: str = None) -> TurnSchedule:
+    m_e = player(w).relation_tag[comps.MapId] if map_id is None else w[map_id]
+    return m_e.components[comps.MapSchedule]
+
+
+def entity_table(w: World, map_id: str = None) -> EntityTable:
+    m_e = player(w).relation_tag[comps.MapId] if map_id is None else w[map_id]
+    return m_e.components[comps.MapEntities]
+
+
 def current_actors(w: World) -> list[Entity]:
-    q = entities(w).all_of(components=[comps.Actor]).none_of(tags=["dead"])
-    return sorted(list(q), key=lambda i: i.components[comps.Actor].speed)
+    return schedule(w).actors
 
 
 def turn_actors(w: World):
     def f(e: Entity) -> bool:
-        return (
-            e.components[comps.Actor].energy >= 0
-            and not e.components[comps.Combatant].dead
-        )
+        return not e.components[comps.Combatant].dead
 
-    return filter(f, current_actors(w))
+    return filter(f, schedule(w).ready())
+
+
+def turn_order(w: World, rows: Iterable, key: Callable[[Any], Entity] = None) -> list:
+    """
+    rows, or the entities key picks out of them, sorted by the current map's
+    schedule and then by position. ECS queries yield entities in an order
+    that depends on their identity, so systems sort them through this to
+    resolve moves and roll dice in the same order in every run.
+    """
+    sched = schedule(w)
+
+    def _order(row) -> tuple[int, int, int]:
+        e = row if key is None else key(row)
+        pos = e.components.get(comps.Location, Point(-1, -1))
+        return sched.rank(e), pos.x, pos.y
+
+    return sorted(rows, key=_order)
 
 
 def entities(w: World, map_id: str = None) -> WorldQuery:
@@ -72,23 +99,34 @@ def entities(w: World, map_id: str = None) -> WorldQuery:
     return w.Q.all_of(components=[comps.Location], relations=[(comps.MapId, m_e)])
 
 
-def entities_at(w: World, pt: Point, map_id: str = None):
-    es = entities(w, map_id)
-    return filter(lambda e: e.components[comps.Location] == pt, es)
+def _spatial(w: World, map_id: str = None) -> SpatialIndex:
+    m = cur_map(w) if map_id is None else get_map(w, map_id)
+    return m.spatial
+
 
+def entities_at(w: World, pt: Point, map_id: str = None) -> list[Entity]:
+    return _spatial(w, map_id).at(pt)
 
-def consumables_at(w: World, pt: Point, map_id: str = None):
-    es = entities(w, map_id)
-    items = es.all_of(components=[comps.Item])
-    return filter(lambda e: e.components[comps.Location] == pt, items)
 
+def consumables_at(w: World, pt: Point, map_id: str = None) -> list[Entity]:
+    items = _spatial(w, map_id).items_at(pt)
+    return [e for e in items if comps.Item in e.components]
 
-def blockers_at(w: World, pt: Point, map_id: str = None):
-    return filter(lambda e: "blocker" in e.tags, entities_at(w, pt, map_id))
 
+def blockers_at(w: World, pt: Point, map_id: str = None) -> list[Entity]:
+    return _spatial(w, map_id).blockers_at(pt)
 
-def items_at(w: World, pt: Point, map_id: str = None):
-    return filter(lambda e: "item" in e.tags, entities_at(w, pt, map_id))
+
+def items_at(w: World, pt: Point, map_id: str = None) -> list[Entity]:
+    return _spatial(w, map_id).items_at(pt)
+
+
+def map_of(e: Entity) -> GameMap | None:
+    m_e = e.relation_tag.get(comps.MapId)
+    if m_e is None:
+        return None
+
+    return m_e.components.get(comps.GameMapComp)
 
 
 def is_visible(e: Entity) -> bool:
@@ -96,15 +134,6 @@ def is_visible(e: Entity) -> bool:
     return cur_map(e.world).visible[pos.x, pos.y]
 
 
-def drawable_entities(w: World) -> list[Entity]:
-    cur_map_e = player(w).relation_tag[comps.MapId]
-    fil = w.Q.all_of(
-        components=[comps.Renderable, comps.Location],
-        relations=[(comps.MapId, cur_map_e)],
-    )
-    return sorted(list(fil), key=lambda i: i.components[comps.Renderable].z)
-
-
 def trying_to_move(w: World) -> WorldQuery:
     m_e = player(w).relation_tag[comps.MapId]
     return w.Q.all_of(
@@ -160,16 +189,28 @@ def is_player(e: Entity) -> bool:
     return "player" in e.tags
 
 
-def messages(w: World) -> list[comps.GameMessage]:
+def messages(w: World) -> MessageLog:
     return w[None].components[comps.Messages]
 
 
+def world_rng(w: World) -> GameRNG:
+    return w[None].components[comps.WorldRNG]
+
+
+def dirty_layers(w: World) -> set[str]:
+    return w[None].components.setdefault(comps.DirtyLayers, set())
+
+
 def find_effect(e: Entity, eff_name: str) -> GameEffect | None:
-    f = list(filter(lambda eff: eff.name == eff_name, e.components[comps.EffectsList]))
-    if f:
-        return f[0]
+    return e.components[comps.Effects].get(eff_name)
+
 
-    return None
+def affected(w: World, map_id: str = None) -> WorldQuery:
+    """Living entities on the map with at least one effect."""
+    m_e = player(w).relation_tag[comps.MapId] if map_id is None else w[map_id]
+    return w.Q.all_of(tags=[comps.HasEffects], relations=[(comps.MapId, m_e)]).none_of(
+        tags=["dead"]
+    )
 
 
 def inventory(e: Entity) -> list[Entity]:
@@ -211,21 +252,37 @@ StatValue = Literal[
 ]
 
 
-def get_stat(e: Entity, stat: StatValue) -> int:
-    def fn(acc: int, n: Entity) -> int:
-        n_stat = getattr(n.components[comps.Equipment], stat)
-        return acc + n_stat
+def stats(e: Entity) -> comps.EffectiveStats:
+    """e's derived stats, only worked out again after updates.invalidate_stats."""
+    cached = e.components.get(comps.EffectiveStatsComp)
+    if cached is None:
+        cached = e.components[comps.EffectiveStatsComp] = derive_stats(e)
+    return cached
 
+
+def derive_stats(e: Entity) -> comps.EffectiveStats:
     comb = e.components[comps.Combatant]
-    s = reduce(fn, get_equipped(e), 0)
+    gear = [n.components[comps.Equipment] for n in get_equipped(e)]
+    dmg = comb.dmg
+    maybe_wpn = get_weapon(e)
+    if maybe_wpn:
+        eq_low, eq_high = maybe_wpn.components[comps.Equipment].dmg
+        dmg = (eq_low + comb.str_mod, eq_high + comb.str_mod)
+
+    return comps.EffectiveStats(
+        atp=comb.atp + sum(g.atp for g in gear),
+        dfp=comb.dfp + sum(g.dfp for g in gear),
+        reduction=comb.base_reduce + sum(g.reduction for g in gear),
+        dmg=dmg,
+        max_hp=comb.max_hp,
+        base_atp=comb.atp,
+        base_dfp=comb.dfp,
+        wl_mod=comb.wl_mod,
+    )
+
 
-    match stat:
-        case "atp":
-            return comb.atp + s
-        case "dfp":
-            return comb.dfp + s
-        case "reduction":
-            return comb.base_reduce + s
+def get_stat(e: Entity, stat: StatValue) -> int:
+    return getattr(stats(e), stat)
 
 
 def get_armor(e: Entity) -> Entity | None:
@@ -240,22 +297,13 @@ def get_trinket(e: Entity) -> Entity | None:
     return e.relation_tag.get(comps.EquippedTrinket)
 
 
-def equips_at(w: World, pt: Point, map_id: str = None):
-    base = entities_at(w, pt, map_id)
-    return filter(lambda e: "equip" in e.tags, base)
+def equips_at(w: World, pt: Point, map_id: str = None) -> list[Entity]:
+    items = _spatial(w, map_id).items_at(pt)
+    return [e for e in items if "equip" in e.tags]
 
 
 def dmg(e: Entity) -> Tuple[int, int]:
-    maybe_wpn = get_weapon(e)
-    comb = e.components[comps.Combatant]
-    st = comb.str_mod
-    dmg = comb.dmg
-
-    if maybe_wpn:
-        eq_low, eq_high = maybe_wpn.components[comps.Equipment].dmg
-        return (eq_low + st, eq_high + st)
-    else:
-        return dmg
+    return stats(e).dmg
 
 
 def required_xp(lvl: int) -> int:
@@ -278,5 +326,6 @@ def check_gain_levels(e: Entity) -> int:
 def xp_list(dead_entity: Entity):
     return dead_entity.world.Q.all_of(relations=[(dead_entity, comps.DamagedBy, None)])
 
+
 def is_winner(w: World) -> bool:
     return "winner" in w[None].tags
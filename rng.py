@@ -0,0 +1,15 @@
+from random import Random, getrandbits
+
+
+class GameRNG:
+    """
+    Seeded random streams for one world. Map generation, spawning and combat
+    each draw from their own stream, so the same seed gives the same dungeon
+    no matter how many dice were rolled in between.
+    """
+
+    def __init__(self, seed: int = None):
+        self.seed = getrandbits(64) if seed is None else seed
+        self.mapgen = Random(f"{self.seed}/mapgen")
+        self.spawn = Random(f"{self.seed}/spawn")
+        self.combat = Random(f"{self.seed}/combat")
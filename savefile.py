@@ -0,0 +1,155 @@
+from __future__ import annotations
+from dataclasses import asdict, dataclass
+from tcod.ecs import World
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import components as comps
+import gamelog as gl
+import json
+import os
+import pickle
+import struct
+import tempfile
+import zlib
+
+SAVE_MAGIC = b"RLDT-SAVE-3\n"
+HEADER_LEN = struct.Struct(">I")
+
+
+@dataclass
+class SaveInfo:
+    """What the title screen needs to know about a save, read without the world."""
+
+    path: str
+    name: str
+    version: str
+    dead: bool
+    winner: bool
+
+
+def _info(w: World, path: str) -> SaveInfo:
+    player = w["player"]
+    return SaveInfo(
+        path,
+        player.components[comps.Name],
+        w[None].components[comps.GameVersion],
+        "dead" in player.tags,
+        "winner" in w[None].tags,
+    )
+
+
+def _read_exact(f, size: int, path: str) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError(f"{path} is truncated")
+    return data
+
+
+def _read_info(f, path: str) -> SaveInfo:
+    if f.read(len(SAVE_MAGIC)) != SAVE_MAGIC:
+        raise ValueError(f"{path} is not a save file")
+
+    (size,) = HEADER_LEN.unpack(_read_exact(f, HEADER_LEN.size, path))
+    header = json.loads(_read_exact(f, size, path))
+    if not isinstance(header, dict):
+        raise ValueError(f"{path} has a bad header")
+
+    header["path"] = path
+    try:
+        return SaveInfo(**header)
+    except TypeError:
+        raise ValueError(f"{path} has a bad header") from None
+
+
+def snapshot(w: World) -> tuple[bytes, bytes]:
+    """The save header and the pickled world, frozen as of now."""
+    header = asdict(_info(w, ""))
+    del header["path"]
+    return (
+        json.dumps(header).encode(),
+        pickle.dumps(w, protocol=pickle.HIGHEST_PROTOCOL),
+    )
+
+
+def write_snapshot(snap: tuple[bytes, bytes], path: str):
+    """
+    Writes a format marker, the header, then the compressed world to a temp
+    file beside path and renames it over path, so a save is never half written.
+    """
+    header_bytes, data = snap
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(SAVE_MAGIC)
+            f.write(HEADER_LEN.pack(len(header_bytes)))
+            f.write(header_bytes)
+            f.write(zlib.compress(data, 1))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def write_save(w: World, path: str):
+    write_snapshot(snapshot(w), path)
+
+
+class Autosaver:
+    """
+    Writes save snapshots on one background thread. Taking the snapshot is
+    the only part done by the caller; compressing and writing are not.
+    An autosave asked for while one is still being written is skipped.
+    """
+
+    def __init__(self):
+        self.__pool = ThreadPoolExecutor(max_workers=1)
+        self.__pending: Future = None
+
+    @property
+    def busy(self) -> bool:
+        return self.__pending is not None and not self.__pending.done()
+
+    def save(self, w: World, path: str) -> bool:
+        if self.busy:
+            return False
+
+        self.__pending = self.__pool.submit(write_snapshot, snapshot(w), path)
+        return True
+
+    def wait(self, w: World):
+        """Blocks until the autosave in flight, if any, is done, logging a failure."""
+        pending, self.__pending = self.__pending, None
+        if pending is None:
+            return
+
+        try:
+            pending.result()
+        except Exception as err:
+            gl.write_log(
+                w,
+                "savefile",
+                "Autosave failed: {!r}",
+                err,
+                level=gl.LogLevels.WARNING,
+            )
+
+
+def read_save_info(path: str) -> SaveInfo:
+    """Reads only the header. Raises ValueError if the file isn't a save."""
+    with open(path, "rb") as f:
+        return _read_info(f, path)
+
+
+def read_save(path: str) -> World:
+    """Raises ValueError if the file isn't a save in this format."""
+    with open(path, "rb") as f:
+        _read_info(f, path)
+        try:
+            w = pickle.loads(zlib.decompress(f.read()))
+        except (zlib.error, pickle.UnpicklingError, EOFError) as err:
+            raise ValueError(f"{path} is corrupt: {err}") from None
+
+    if not isinstance(w, World):
+        raise ValueError(f"{path} does not hold a world")
+    return w
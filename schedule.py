@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from heapq import heappop, heappush
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from tcod.ecs import Entity
+    from components import Actor
+
+
+class TurnSchedule:
+    """
+    Energy-based turn order for the actors on one map.
+    Keeps a speed-sorted roster and a heap of the tick at which each actor
+    next reaches zero energy, so the turn loop can tell when anyone can act
+    without scanning every actor.
+    """
+
+    def __init__(self):
+        self.__clock = 0
+        self.__seq = 0
+        self.__heap: list[tuple[int, int, Entity]] = list()
+        self.__due: dict[Entity, int] = dict()
+        self.__roster: dict[Entity, Actor] = dict()
+        self.__sorted: list[Entity] = None
+        self.__ranks: dict[Entity, int] = None
+
+    def __contains__(self, e: Entity) -> bool:
+        return e in self.__roster
+
+    def __len__(self) -> int:
+        return len(self.__roster)
+
+    @property
+    def clock(self) -> int:
+        return self.__clock
+
+    def __ready_at(self, e: Entity) -> int | None:
+        act = self.__roster[e]
+        if act.energy >= 0:
+            return self.__clock
+        if act.speed <= 0:
+            return None
+        return self.__clock - (act.energy // act.speed)
+
+    def __push(self, e: Entity):
+        at = self.__ready_at(e)
+        if at is None:
+            self.__due.pop(e, None)
+            return
+
+        self.__due[e] = at
+        self.__seq += 1
+        heappush(self.__heap, (at, self.__seq, e))
+
+    def add(self, e: Entity, act: Actor):
+        self.__roster[e] = act
+        self.__sorted = None
+        self.__push(e)
+
+    def remove(self, e: Entity):
+        self.__roster.pop(e, None)
+        self.__due.pop(e, None)
+        self.__sorted = None
+
+    @property
+    def actors(self) -> list[Entity]:
+        """Every actor on the map, slowest first."""
+        if self.__sorted is None:
+            self.__sorted = sorted(self.__roster, key=lambda e: self.__roster[e].speed)
+            self.__ranks = None
+        return self.__sorted
+
+    def rank(self, e: Entity) -> int:
+        """Where e comes in actors; anything not on the roster comes after them."""
+        actors = self.actors
+        if self.__ranks is None:
+            self.__ranks = {a: i for i, a in enumerate(actors)}
+        return self.__ranks.get(e, len(actors))
+
+    def ready(self) -> list[Entity]:
+        return [e for e in self.actors if self.__roster[e].energy >= 0]
+
+    def ticks_until_ready(self) -> int | None:
+        """
+        Ticks until the next actor reaches zero energy; 0 if one already has.
+        None if nobody on the map will ever act again.
+
+        Actors gain their speed in energy once per advance and otherwise only
+        spend it, so a heap entry is never later than its actor's real ready
+        tick; stale entries are fixed up as they surface.
+        """
+        while self.__heap:
+            at, _, e = self.__heap[0]
+            if e not in self.__roster or self.__due.get(e) != at:
+                heappop(self.__heap)
+                continue
+
+            real = self.__ready_at(e)
+            if real == at or (real == self.__clock and at < real):
+                return max(0, at - self.__clock)
+
+            heappop(self.__heap)
+            self.__push(e)
+
+        return None
+
+    def advance(self, ticks: int = 1):
+        self.__clock += ticks
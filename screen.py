@@ -5,6 +5,7 @@ import tcod.event
 
 from tcod.ecs import World, Entity
 from typing import TYPE_CHECKING
+from profiler import PROFILER
 
 
 if TYPE_CHECKING:
@@ -29,6 +30,7 @@ SIGNALS = {
     tcod.event.KeySym.ESCAPE: "cancel",
     tcod.event.KeySym.SPACE: "wait",
     tcod.event.KeySym.i: "inventory",
+    tcod.event.KeySym.F3: "profile",
 }
 
 
@@ -118,6 +120,10 @@ class Screen(tcod.event.EventDispatch):
     def on_inventory(self):
         pass
 
+    def on_profile(self):
+        if PROFILER.enabled:
+            self.engine.show_profile = not self.engine.show_profile
+
     def ev_keydown(self, event: tcod.event.KeyDown):
         signal = SIGNALS.get(event.sym)
         match signal:
@@ -137,6 +143,8 @@ class Screen(tcod.event.EventDispatch):
                 return self.on_wait()
             case "inventory":
                 return self.on_inventory()
+            case "profile":
+                return self.on_profile()
             case _:
                 return None
 
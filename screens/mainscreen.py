@@ -1,20 +1,20 @@
 from __future__ import annotations
 
-from gamelog import write_log
 from screen import Screen, ScreenNames
 from tcod.console import Console
 from gamemap import GameMap
-from tcod.path import hillclimb2d
 from geom import Point, Direction
 from typing import TYPE_CHECKING
 from swatch import HP_EMPTY, HP_FILLED, TARGET
+from constants import AUTOSAVE_TURNS
 
-from tcod.ecs import Entity
+from tcod.ecs import Entity, World
 
 import components as comps
+import factory as fac
 import queries as q
 import updates as u
-import combat as cbt
+import systems as sy
 import ui
 
 if TYPE_CHECKING:
@@ -38,6 +38,25 @@ class MainScreen(Screen):
         self.mode = GameStates.MAIN
         self.save_menu = ui.YesNoMenu(self.engine.root, "Save Game?")
         self.item_menu: ui.MenuWithValues = None
+        self.__layers = {
+            name: Console(ui.SCR_W, ui.SCR_H, order="F") for name in ui.Layers.ALL
+        }
+        self.__view_key = None
+        self.systems = sy.turn_systems()
+        self.systems.register(
+            sy.System(
+                "check_target",
+                self.check_target,
+                reads=(comps.Combatant, comps.Location, comps.GameMapComp),
+            ),
+            before="end_turn",
+        )
+        self.systems.register(
+            sy.System(
+                "autosave", self.autosave, reads=(comps.GameTicks, comps.GameTurn)
+            ),
+            before="update_fov",
+        )
         self.item_help = ui.TextBox(
             self.engine.root,
             30,
@@ -52,28 +71,12 @@ class MainScreen(Screen):
 
     def on_enter(self):
         self.mode = GameStates.MAIN
+        sy.update_fov(self.world)
+        u.mark_dirty(self.world, *ui.Layers.ALL)
 
     def on_draw(self, con: Console):
-        w = self.world
-        cur_map = self.cur_map
-        ui.draw_map(cur_map, self.camera, con)
-        # ui.draw_dmap(cur_map, self.camera, con)
-        for e in q.drawable_entities(w):
-            p = e.components[comps.Location]
-            render = e.components[comps.Renderable]
-            if cur_map.visible[p.x, p.y] or not cur_map.dark:
-                ui.draw_on_map(
-                    p.x,
-                    p.y,
-                    render.glyph,
-                    self.camera,
-                    con,
-                    cur_map,
-                    render.color,
-                )
-        ui.draw_msgs(w, con)
-        self.draw_stats(con)
-        self.draw_fx(con)
+        self.render_layers()
+        self.compose_layers(con)
         self.draw_look(con)
         if self.mode == GameStates.SAVE:
             self.save_menu.draw()
@@ -81,239 +84,70 @@ class MainScreen(Screen):
             self.item_menu.draw()
             self.item_help.draw()
 
+    def render_layers(self):
+        """Redraws the cached layers marked dirty since the last frame."""
+        w = self.world
+        cur_map = self.cur_map
+        dirty = q.dirty_layers(w)
+        view_key = (cur_map.id, self.camera.start_point(cur_map))
+        if view_key != self.__view_key:
+            self.__view_key = view_key
+            dirty.add(ui.Layers.MAP)
+
+        layers = self.__layers
+        if ui.Layers.MAP in dirty:
+            layers[ui.Layers.MAP].clear()
+            ui.draw_map(cur_map, self.camera, layers[ui.Layers.MAP])
+            # ui.draw_dmap(cur_map, self.camera, layers[ui.Layers.MAP])
+            dirty.add(ui.Layers.ENTITIES)
+        if ui.Layers.ENTITIES in dirty:
+            scene = layers[ui.Layers.ENTITIES]
+            scene.rgb[...] = layers[ui.Layers.MAP].rgb
+            ui.draw_entities(cur_map, q.entity_table(w), self.camera, scene)
+        if ui.Layers.SIDEBAR in dirty:
+            layers[ui.Layers.SIDEBAR].clear()
+            self.draw_stats(layers[ui.Layers.SIDEBAR])
+            self.draw_fx(layers[ui.Layers.SIDEBAR])
+        if ui.Layers.MESSAGES in dirty:
+            layers[ui.Layers.MESSAGES].clear()
+            ui.draw_msgs(w, layers[ui.Layers.MESSAGES])
+        dirty.clear()
+
+    def compose_layers(self, con: Console):
+        side_w = ui.SCR_W - ui.MAP_W
+        layers = self.__layers
+        layers[ui.Layers.ENTITIES].blit(con, 0, 0, 0, 0, ui.MAP_W, ui.MAP_H)
+        layers[ui.Layers.MESSAGES].blit(
+            con, 0, ui.MAP_H, 0, ui.MAP_H, ui.MSG_W, ui.MSG_H
+        )
+        layers[ui.Layers.SIDEBAR].blit(con, ui.MAP_W, 0, ui.MAP_W, 0, side_w, ui.SCR_H)
+
     def on_update(self):
-        player = self.player
-        while True:
-            self.update_dmap()
-            self.get_npc_moves()
-            self.check_moves()
-            self.check_collisions()
-            self.resolve_bumps()
-            self.check_on_hits()
-            self.check_item_users()
-            self.check_deaths()
-            self.update_energy()
-            self.check_target()
-            self.end_turn()
-            self.update_fov()
-
-            should_break = player.components[comps.Actor].energy >= 0 or q.is_dead(
-                self.player
-            )
-
-            if should_break:
-                break
-
-        pos = player.components[comps.Location]
+        self.systems.run(self.world, self.turn_over)
+        pos = self.player.components[comps.Location]
         self.camera.center = pos
+        u.mark_dirty(self.world, ui.Layers.SIDEBAR)
         if q.is_dead(self.player):
             self.engine.shutdown()
             self.engine.switch_screen(ScreenNames.GAME_OVER)
 
-    def check_collisions(self):
-        for e, target in q.collisions(self.world):
-            e_actor_comp = e.components[comps.Actor]
-
-            if target == e:
-                e_actor_comp.energy -= 100
-                e.components.pop(comps.CollidesWith)
-                continue
-
-            if q.is_hostile(e, target):
-                e.components[comps.BumpAttacking] = target
+    def turn_over(self, w: World) -> bool:
+        """The pipeline hands control back once the player can act or has died."""
+        return self.player.components[comps.Actor].energy >= 0 or q.is_dead(self.player)
 
-            e.components.pop(comps.CollidesWith)
-
-    def check_moves(self):
-        cur_map = self.cur_map
-        for e in q.trying_to_move(self.world):
-            dest = e.components[comps.TryMove]
-
-            if cur_map.walkable(dest.x, dest.y):
-                blockers = list(q.blockers_at(self.world, dest))
-                if len(blockers) > 0:
-                    e.components[comps.CollidesWith] = blockers[0]
-                else:
-                    e.components[comps.Location] = dest
-                    e.components[comps.Actor].energy -= 100
-                    arm = q.get_armor(e)
-                    if arm:
-                        e.components[comps.Actor].energy -= arm.components[
-                            comps.Equipment
-                        ].encumbrance
-                    write_log(self.world, "action", f"{q.name(e)} moved")
-
-                    if e.components.get(comps.InventoryMax) is not None:
-                        items = q.items_at(self.world, e.components[comps.Location])
-                        for item in items:
-                            u.pick_up_item(item, e)
-
-            e.components.pop(comps.TryMove)
-
-    def get_npc_moves(self):
-        cur_map = self.cur_map
-        for e in filter(lambda e: q.is_enemy(e), q.turn_actors(self.world)):
-            write_log(self.world, "action", f"{q.name(e)} acts")
-            e_pos = e.components[comps.Location]
-            path = hillclimb2d(cur_map.dist, (e_pos.x, e_pos.y), True, False)
-
-            if len(path) > 1:
-                try_x, try_y = path[1]
-                e.components[comps.TryMove] = Point(try_x, try_y)
-
-    def update_dmap(self):
-        pos = self.player.components[comps.Location]
-        enemies = filter(lambda e: q.is_enemy(e), q.turn_actors(self.world))
-        enemy_locs = map(lambda e: e.components[comps.Location], enemies)
-        self.cur_map.update_cost(enemy_locs)
-        self.cur_map.update_dmap(pos)
-
-    def update_energy(self):
-        for e in q.current_actors(self.world):
-            act_comp = e.components[comps.Actor]
-            stun_eff = q.find_effect(e, "Stunned")
-            if not stun_eff:
-                act_comp.energy += act_comp.speed
-            else:
-                write_log(self.world, "energy", f"{q.name(e)} is stunned; no energy")
-
-            write_log(
-                self.world,
-                "energy",
-                f"{q.name(e)} gains {act_comp.speed} energy, has {act_comp.energy}",
-            )
-
-    def resolve_bumps(self):
-        for attacker, defender in q.bumpers(self.world):
-            atk_name = q.name(attacker)
-            def_name = q.name(defender)
-
-            u.add_msg_about(attacker, f"<entity> attacks {def_name}!")
-            result = cbt.bump_attack(attacker, defender)
-            write_log(
-                self.world,
-                "combat",
-                f"{atk_name} bumping {def_name}: hit={result.hit}, margin={result.margin}",  # noqa: E501
-            )
-            if result.hit:
-                dmg_l, dmg_h = q.dmg(attacker)
-                raw_dmg = cbt.gauss_roll(dmg_l, dmg_h)
-                def_redu = q.get_stat(defender, "reduction")
-                final_dmg = max(0, raw_dmg - def_redu)
-                defender.components[comps.Combatant].damage(final_dmg)
-                arm = q.get_armor(defender)
-                if arm:
-                    arm.components[comps.Equipment].durability -= 1
-                u.add_msg_about(
-                    attacker,
-                    f"<entity> hits {def_name} for {final_dmg} damage!",
-                )
-                write_log(
-                    self.world,
-                    "combat",
-                    f"{atk_name} bumps {def_name} for {raw_dmg} raw, {final_dmg} after armor reduction",  # noqa: E501
-                )
-                wpn = q.get_weapon(attacker)
-                if wpn:
-                    wpn.components[comps.CheckOnHits] = defender
-                else:
-                    attacker.components[comps.CheckOnHits] = defender
-
-                defender.relation_tags_many[comps.DamagedBy].add(attacker)
-
-            else:
-                u.add_msg_about(attacker, f"<entity> misses {def_name}!")
-
-            attacker.components[comps.Actor].energy -= 100
-            attacker.components.pop(comps.BumpAttacking)
-
-    def check_deaths(self):
-        query = q.living(self.world)
-        for e, stats in query[Entity, comps.Combatant]:
-            if stats.dead:
-                u.add_msg_about(e, "<entity> has fallen!")
-                for killer in q.xp_list(e):
-                    u.gain_xp(killer, e)
-                u.kill(e)
-                e.relation_tags_many[comps.DamagedBy].clear()
-
-    def check_on_hits(self):
-        for attacker, defender, on_hit in q.on_hits(self.world):
-            atk_name = q.name(attacker)
-            def_name = q.name(defender)
-            write_log(
-                self.world,
-                "combat",
-                f"Checking on-hits for {atk_name} against {def_name}",
-            )
-            if cbt.pct_chance(on_hit.chance):
-                u.apply_effect(defender, on_hit.eff)
-                write_log(
-                    self.world,
-                    "combat",
-                    f"On-hit {on_hit.eff.name} successfully applied by {atk_name} to {def_name}",  # noqa: E501
-                )
-            attacker.components.pop(comps.CheckOnHits)
-
-    def check_item_users(self):
-        for e, use_info in q.trying_to_use_item(self.world):
-            item = use_info.item
-            item_comp = item.components[comps.Item]
-            target = use_info.target
-            user_name = q.name(e)
-            target_name = q.name(target)
-            item_name = q.name(item)
-            wl_mod = e.components[comps.Combatant].wl_mod
-            match item_comp.item_delivery:
-                case "throw":
-                    if q.is_visible(e) and q.is_visible(target):
-                        u.add_msg_about(
-                            e, f"<entity> throws {item_name} at {target_name}!"
-                        )
-                    u.apply_item(item, target)
-                    target.relation_tags_many[comps.DamagedBy].add(e)
-                case "drink":
-                    if q.is_visible(e):
-                        u.add_msg_about(e, f"<entity> drinks {item_name}.")
-                    u.apply_item(item, e)
-                case "read":
-                    dur = item_comp.eff_duration + wl_mod // 2
-                    pot = item_comp.eff_potency + wl_mod
-                    if q.is_visible(e):
-                        if e is target:
-                            u.add_msg_about(e, f"<entity> reads {item_name}!")
-                        else:
-                            u.add_msg_about(
-                                e,
-                                f"<entity> reads {item_name}, pointing at {target_name}!",  # noqa: E501
-                            )
-                            target.relation_tags_many[comps.DamagedBy].add(e)
-                    u.apply_item(item, target, duration=dur, potency=pot)
-            item.clear()
-            e.components[comps.Actor].energy -= 100
-            write_log(
-                self.world, "item", f"{user_name} uses {item_name} on {target_name}"
-            )
-            e.components.pop(comps.UseItemOn)
-
-    def end_turn(self):
-        query = q.current_actors(self.world)
-        sentinel = self.world[None].components[comps.GameTicks]
-        if sentinel == 5:
-            for e in query:
-                u.tick_effects(e, 1)
-            self.world[None].components[comps.GameTicks] = 0
-            self.world[None].components[comps.GameTurn] += 1
-            write_log(self.world, "end turn", "Turn ends")
-        else:
-            self.world[None].components[comps.GameTicks] += 1
-
-    def check_target(self):
+    def check_target(self, w: World, ticks: int = 1):
         if self.select_target and (
             not q.is_visible(self.select_target) or q.is_dead(self.select_target)
         ):
             self.select_target = None
 
+    def autosave(self, w: World, ticks: int = 1):
+        """Saves in the background every AUTOSAVE_TURNS, as the turn ends."""
+        turn = w[None].components[comps.GameTurn]
+        turn_ended = turn > 0 and w[None].components[comps.GameTicks] == 0
+        if turn_ended and turn % AUTOSAVE_TURNS == 0:
+            self.engine.autosave()
+
     def on_up(self):
         match self.mode:
             case GameStates.MAIN:
@@ -418,8 +252,9 @@ class MainScreen(Screen):
                 tile = self.cur_map.tiles[loc.x, loc.y]
                 went_stairs = False
                 if tile == self.cur_map.stairs_down_tile:
-                    new_m, new_loc = map_conns["down"]
-                    u.change_map(self.player, new_m, new_loc)
+                    fac.descend(
+                        self.player, map_conns["down"][0], self.engine.prefetcher
+                    )
                     went_stairs = True
                 elif tile == self.cur_map.stairs_up_tile:
                     new_m, new_loc = map_conns["up"]
@@ -454,15 +289,12 @@ class MainScreen(Screen):
 
     def on_mouse_click(self, x: int, y: int):
         if self.mode == GameStates.MAIN:
-            blocker_list = list(q.blockers_at(self.world, self.look_target))
+            blocker_list = q.blockers_at(self.world, self.look_target)
             if blocker_list:
                 blocker = blocker_list[0]
                 if q.is_visible(blocker):
                     self.select_target = blocker
-
-    def update_fov(self):
-        player_loc = self.player.components[comps.Location]
-        self.cur_map.update_fov(player_loc.x, player_loc.y, 8)
+                    u.mark_dirty(self.world, ui.Layers.SIDEBAR)
 
     def draw_stats(self, con: Console):
         stats = self.player.components[comps.Combatant]
@@ -480,10 +312,9 @@ class MainScreen(Screen):
         arm_text = q.name(arm) if arm else "None"
         trink_text = q.name(trink) if trink else "None"
 
-        atp = q.get_stat(self.player, "atp")
-        dfp = q.get_stat(self.player, "dfp")
-        redu = q.get_stat(self.player, "reduction")
-        dmg_l, dmg_h = q.dmg(self.player)
+        eff_stats = q.stats(self.player)
+        atp, dfp, redu = eff_stats.atp, eff_stats.dfp, eff_stats.reduction
+        dmg_l, dmg_h = eff_stats.dmg
         lvl = self.player.components[comps.Level]
         cur_xp = lvl.xp
         next_xp = q.required_xp(lvl.level + 1)
@@ -503,9 +334,7 @@ class MainScreen(Screen):
 
     def draw_fx(self, con: Console):
         effects = list(
-            filter(
-                lambda eff: not eff.expired, self.player.components[comps.EffectsList]
-            )
+            filter(lambda eff: not eff.expired, self.player.components[comps.Effects])
         )
         x = ui.MSG_W
         y = ui.MAP_H
@@ -518,14 +347,15 @@ class MainScreen(Screen):
         if not vitals:
             return
 
-        ui.draw_bar(x, y, vitals.cur_hp, vitals.max_hp, w, HP_FILLED, HP_EMPTY, con)
+        max_hp = q.stats(e).max_hp
+        ui.draw_bar(x, y, vitals.cur_hp, max_hp, w, HP_FILLED, HP_EMPTY, con)
 
     def draw_look(self, con: Console):
         lt = self.look_target
         if lt:
             ui.draw_on_map(lt.x, lt.y, "X", self.camera, con, self.cur_map, TARGET)
 
-            es = list(q.entities_at(self.world, lt))
+            es = q.entities_at(self.world, lt)
             if es and self.cur_map.visible[lt.x, lt.y]:
                 con.print(ui.MAP_W, 11, "Things here:")
                 for i, e in enumerate(es):
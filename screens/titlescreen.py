@@ -4,27 +4,21 @@ import re
 from typing import TYPE_CHECKING
 from constants import VERSION
 from screen import Screen, ScreenNames
-from tcod.ecs import World
 from tcod.console import Console
-from components import (
-    GameVersion,
-    Name,
-)
 from ui import Menu
+from savefile import SaveInfo, read_save, read_save_info
 
-import pickle
 import glob
 
 if TYPE_CHECKING:
     from engine import Engine
 
 
-def _load_world(fn: str) -> World:
-    world: World = None
-    with open(fn, "rb") as f:
-        world = pickle.load(f)
-
-    return world
+def _load_info(fn: str) -> SaveInfo | None:
+    try:
+        return read_save_info(fn)
+    except (ValueError, OSError):
+        return None
 
 
 class TitleScreen(Screen):
@@ -43,17 +37,14 @@ class TitleScreen(Screen):
 
     def on_enter(self):
         file_list = sorted(glob.glob("saves/*.sav"))
-        world_list = [_load_world(file) for file in file_list]
+        info_list = filter(None, [_load_info(file) for file in file_list])
         last_name = ""
         counter = 1
+        self.load_choices = dict()
 
-        for w in world_list:
-            fn = w["player"].components[Name]
-            if (
-                w[None].components[GameVersion] == VERSION
-                and "dead" not in w["player"].tags
-                and not "winner" in w[None].tags
-            ):
+        for info in info_list:
+            fn = info.name
+            if info.version == VERSION and not info.dead and not info.winner:
                 if fn == last_name:
                     counter += 1
                     fn = f"{fn}-{counter}"
@@ -61,7 +52,7 @@ class TitleScreen(Screen):
                     last_name = fn
                     counter = 1
 
-                self.load_choices[fn] = w
+                self.load_choices[fn] = info.path
         new_game_list = [f"New Game - {hero}" for hero in self.new_choices.keys()]
         save_games = list(self.load_choices.keys())
 
@@ -92,6 +83,10 @@ class TitleScreen(Screen):
         elif result == "Exit Game":
             raise SystemExit()
         else:
-            self.engine.load_game(self.load_choices[result])
+            try:
+                self.engine.load_game(read_save(self.load_choices[result]))
+            except (ValueError, OSError):
+                self.on_enter()
+                return
 
         self.engine.switch_screen(ScreenNames.MAIN)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from geom import Point
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from tcod.ecs import Entity
+
+
+class SpatialIndex:
+    """
+    Maps tiles to the entities standing on them.
+    Blockers and items are kept in their own layers.
+    """
+
+    def __init__(self):
+        self.__where: dict[Entity, Point] = dict()
+        self.__all: dict[Point, dict[Entity, None]] = dict()
+        self.__blockers: dict[Point, dict[Entity, None]] = dict()
+        self.__items: dict[Point, dict[Entity, None]] = dict()
+
+    def __contains__(self, e: Entity) -> bool:
+        return e in self.__where
+
+    def __len__(self) -> int:
+        return len(self.__where)
+
+    @staticmethod
+    def __put(layer: dict, pt: Point, e: Entity):
+        layer.setdefault(pt, dict())[e] = None
+
+    @staticmethod
+    def __take(layer: dict, pt: Point, e: Entity):
+        here = layer.get(pt)
+        if here is not None:
+            here.pop(e, None)
+            if not here:
+                del layer[pt]
+
+    def add(self, e: Entity, pt: Point):
+        if e in self.__where:
+            self.remove(e)
+
+        self.__where[e] = pt
+        self.__put(self.__all, pt, e)
+        if "blocker" in e.tags:
+            self.__put(self.__blockers, pt, e)
+        if "item" in e.tags:
+            self.__put(self.__items, pt, e)
+
+    def remove(self, e: Entity):
+        pt = self.__where.pop(e, None)
+        if pt is None:
+            return
+
+        self.__take(self.__all, pt, e)
+        self.__take(self.__blockers, pt, e)
+        self.__take(self.__items, pt, e)
+
+    def move(self, e: Entity, pt: Point):
+        self.add(e, pt)
+
+    def refresh(self, e: Entity):
+        """Re-files an entity after its blocker or item tags change."""
+        pt = self.__where.get(e)
+        if pt is not None:
+            self.add(e, pt)
+
+    def location(self, e: Entity) -> Point | None:
+        return self.__where.get(e)
+
+    def at(self, pt: Point) -> list[Entity]:
+        return list(self.__all.get(pt, ()))
+
+    def blockers_at(self, pt: Point) -> list[Entity]:
+        return list(self.__blockers.get(pt, ()))
+
+    def items_at(self, pt: Point) -> list[Entity]:
+        return list(self.__items.get(pt, ()))
+
+    def occupied(self) -> set[Point]:
+        """Tiles holding a blocker or an item."""
+        return self.__blockers.keys() | self.__items.keys()
+
+    def is_blocked(self, pt: Point) -> bool:
+        return pt in self.__blockers
+
+    def has_items(self, pt: Point) -> bool:
+        return pt in self.__items
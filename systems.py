@@ -0,0 +1,482 @@
+"""
+The turn pipeline: the systems that advance the world between player inputs,
+and the scheduler that runs them. Systems only touch the world, so the same
+pipeline runs with or without a screen.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Callable, Iterable
+
+from tcod.ecs import Entity, World
+from tcod.path import hillclimb2d
+
+from constants import DMAP_RADIUS, UPKEEP_TICK
+from gamelog import log_enabled, write_log
+from geom import Point
+from profiler import PROFILER
+
+import components as comps
+import queries as q
+import ui
+import updates as u
+import combat as cbt
+
+
+class Phases:
+    READY = "ready"
+    TICK = "tick"
+
+
+@dataclass
+class System:
+    """
+    A step of the turn pipeline, called as fn(world, ticks).
+    READY systems only run when an actor can act; TICK systems run for every
+    batch of ticks. A system with needs is skipped while that query is empty.
+    reads and writes declare the components it uses.
+    """
+
+    name: str
+    fn: Callable[[World, int], None]
+    phase: str = Phases.TICK
+    reads: tuple = ()
+    writes: tuple = ()
+    needs: Callable[[World], Iterable] = None
+    enabled: bool = True
+    calls: int = 0
+    skips: int = 0
+    secs: float = 0.0
+
+
+def _comp_name(comp) -> str:
+    return comp[0] if isinstance(comp, tuple) else comp
+
+
+class SystemScheduler:
+    """
+    Runs systems in registration order, one batch of ticks at a time, until a
+    stop condition holds. Per-system call counts and times are only kept
+    while timed is set; each call's time also goes to the profiler.
+    """
+
+    def __init__(self):
+        self.timed = PROFILER.enabled
+        self.__systems: dict[str, System] = dict()
+
+    def __iter__(self):
+        return iter(self.__systems.values())
+
+    def __getitem__(self, name: str) -> System:
+        return self.__systems[name]
+
+    def register(self, system: System, before: str = None):
+        """
+        Adds a system at the end of the pipeline, or before another one.
+        A system can't go before one that writes a component it reads, as it
+        would only ever see that system's output from the previous batch.
+        """
+        if before is None:
+            self.__systems[system.name] = system
+            return
+
+        ahead = self.__systems[before]
+        stale = [c for c in system.reads if c in ahead.writes]
+        if stale:
+            names = ", ".join(_comp_name(c) for c in stale)
+            raise ValueError(f"{system.name} reads {names}, written by {before}")
+
+        systems = list(self.__systems.values())
+        systems.insert(systems.index(ahead), system)
+        self.__systems = {s.name: s for s in systems}
+
+    def enable(self, name: str):
+        self.__systems[name].enabled = True
+
+    def disable(self, name: str):
+        self.__systems[name].enabled = False
+
+    def reset_timings(self):
+        for s in self:
+            s.calls, s.skips, s.secs = 0, 0, 0.0
+
+    def run(self, w: World, until: Callable[[World], bool]):
+        while True:
+            idle = q.schedule(w).ticks_until_ready()
+            ticks = idle_ticks(w, idle)
+            for s in self:
+                if not s.enabled or (s.phase == Phases.READY and idle != 0):
+                    continue
+                if s.needs is not None and next(iter(s.needs(w)), None) is None:
+                    s.skips += self.timed
+                    continue
+
+                if self.timed:
+                    t0 = perf_counter()
+                    s.fn(w, ticks)
+                    secs = perf_counter() - t0
+                    s.secs += secs
+                    s.calls += 1
+                    PROFILER.record(f"system.{s.name}", secs)
+                else:
+                    s.fn(w, ticks)
+
+            if until(w):
+                break
+
+
+def _first(row: tuple) -> Entity:
+    return row[0]
+
+
+def _wielder(row: tuple) -> Entity:
+    """On-hits are checked on weapons; they go in their holder's turn order."""
+    return row[0].relation_tag.get(comps.HeldBy, row[0])
+
+
+def idle_ticks(w: World, until_ready: int | None) -> int:
+    """
+    How many ticks to run as one batch. Nobody acts before until_ready ticks
+    pass, so those ticks only gain energy, up to the next upkeep tick where
+    effects must run on their own.
+    """
+    if until_ready == 0:
+        return 1
+
+    to_upkeep = UPKEEP_TICK - w[None].components[comps.GameTicks]
+    if until_ready is None:
+        return max(1, to_upkeep)
+
+    return max(1, min(until_ready, to_upkeep))
+
+
+def update_dmap(w: World, ticks: int = 1):
+    pos = q.player(w).components[comps.Location]
+    enemies = filter(lambda e: q.is_enemy(e), q.turn_actors(w))
+    enemy_locs = map(lambda e: e.components[comps.Location], enemies)
+    m = q.cur_map(w)
+    m.update_cost(enemy_locs)
+    m.update_dmap(pos, radius=DMAP_RADIUS)
+
+
+def get_npc_moves(w: World, ticks: int = 1):
+    cur_map = q.cur_map(w)
+    player_pos = q.player(w).components[comps.Location]
+    for e in filter(lambda e: q.is_enemy(e), q.turn_actors(w)):
+        write_log(w, "action", "{} acts", e)
+        e_pos = e.components[comps.Location]
+
+        if not cur_map.reached(e_pos.x, e_pos.y):
+            step = cur_map.greedy_step(e_pos, player_pos)
+            if step:
+                e.components[comps.TryMove] = step
+            continue
+
+        path = hillclimb2d(cur_map.dist, (e_pos.x, e_pos.y), True, False)
+
+        if len(path) > 1:
+            try_x, try_y = path[1]
+            e.components[comps.TryMove] = Point(try_x, try_y)
+
+
+def check_moves(w: World, ticks: int = 1):
+    cur_map = q.cur_map(w)
+    for e in q.turn_order(w, q.trying_to_move(w)):
+        dest = e.components[comps.TryMove]
+
+        if cur_map.walkable(dest.x, dest.y):
+            blockers = q.blockers_at(w, dest)
+            if blockers:
+                e.components[comps.CollidesWith] = blockers[0]
+            else:
+                u.move_entity(e, dest)
+                e.components[comps.Actor].energy -= 100
+                arm = q.get_armor(e)
+                if arm:
+                    e.components[comps.Actor].energy -= arm.components[
+                        comps.Equipment
+                    ].encumbrance
+                write_log(w, "action", "{} moved", e)
+
+                if e.components.get(comps.InventoryMax) is not None:
+                    items = q.items_at(w, e.components[comps.Location])
+                    for item in items:
+                        u.pick_up_item(item, e)
+
+        e.components.pop(comps.TryMove)
+
+
+def check_collisions(w: World, ticks: int = 1):
+    for e, target in q.turn_order(w, q.collisions(w), _first):
+        e_actor_comp = e.components[comps.Actor]
+
+        if target == e:
+            e_actor_comp.energy -= 100
+            e.components.pop(comps.CollidesWith)
+            continue
+
+        if q.is_hostile(e, target):
+            e.components[comps.BumpAttacking] = target
+
+        e.components.pop(comps.CollidesWith)
+
+
+def resolve_bumps(w: World, ticks: int = 1):
+    dice = q.world_rng(w).combat
+    for attacker, defender in q.turn_order(w, q.bumpers(w), _first):
+        atk_name = q.name(attacker)
+        def_name = q.name(defender)
+
+        u.add_msg_about(attacker, f"<entity> attacks {def_name}!")
+        result = cbt.bump_attack(attacker, defender, dice)
+        write_log(
+            w,
+            "combat",
+            "{} bumping {}: hit={}, margin={}",
+            atk_name,
+            def_name,
+            result.hit,
+            result.margin,
+        )
+        if result.hit:
+            dmg_l, dmg_h = q.dmg(attacker)
+            raw_dmg = cbt.gauss_roll(dmg_l, dmg_h, dice)
+            def_redu = q.get_stat(defender, "reduction")
+            final_dmg = max(0, raw_dmg - def_redu)
+            defender.components[comps.Combatant].damage(final_dmg)
+            arm = q.get_armor(defender)
+            if arm:
+                arm.components[comps.Equipment].durability -= 1
+            u.add_msg_about(
+                attacker,
+                f"<entity> hits {def_name} for {final_dmg} damage!",
+            )
+            write_log(
+                w,
+                "combat",
+                "{} bumps {} for {} raw, {} after armor reduction",
+                atk_name,
+                def_name,
+                raw_dmg,
+                final_dmg,
+            )
+            wpn = q.get_weapon(attacker)
+            if wpn:
+                wpn.components[comps.CheckOnHits] = defender
+            else:
+                attacker.components[comps.CheckOnHits] = defender
+
+            defender.relation_tags_many[comps.DamagedBy].add(attacker)
+
+        else:
+            u.add_msg_about(attacker, f"<entity> misses {def_name}!")
+
+        attacker.components[comps.Actor].energy -= 100
+        attacker.components.pop(comps.BumpAttacking)
+
+
+def check_on_hits(w: World, ticks: int = 1):
+    for attacker, defender, on_hit in q.turn_order(w, q.on_hits(w), _wielder):
+        atk_name = q.name(attacker)
+        def_name = q.name(defender)
+        write_log(
+            w,
+            "combat",
+            "Checking on-hits for {} against {}",
+            atk_name,
+            def_name,
+        )
+        if cbt.pct_chance(on_hit.chance, q.world_rng(w).combat):
+            u.apply_effect(defender, on_hit.eff)
+            write_log(
+                w,
+                "combat",
+                "On-hit {} successfully applied by {} to {}",
+                on_hit.eff.name,
+                atk_name,
+                def_name,
+            )
+        attacker.components.pop(comps.CheckOnHits)
+
+
+def check_item_users(w: World, ticks: int = 1):
+    for e, use_info in q.turn_order(w, q.trying_to_use_item(w), _first):
+        item = use_info.item
+        item_comp = item.components[comps.Item]
+        target = use_info.target
+        user_name = q.name(e)
+        target_name = q.name(target)
+        item_name = q.name(item)
+        wl_mod = q.stats(e).wl_mod
+        match item_comp.item_delivery:
+            case "throw":
+                if q.is_visible(e) and q.is_visible(target):
+                    u.add_msg_about(e, f"<entity> throws {item_name} at {target_name}!")
+                u.apply_item(item, target)
+                target.relation_tags_many[comps.DamagedBy].add(e)
+            case "drink":
+                if q.is_visible(e):
+                    u.add_msg_about(e, f"<entity> drinks {item_name}.")
+                u.apply_item(item, e)
+            case "read":
+                dur = item_comp.eff_duration + wl_mod // 2
+                pot = item_comp.eff_potency + wl_mod
+                if q.is_visible(e):
+                    if e is target:
+                        u.add_msg_about(e, f"<entity> reads {item_name}!")
+                    else:
+                        u.add_msg_about(
+                            e,
+                            f"<entity> reads {item_name}, pointing at {target_name}!",  # noqa: E501
+                        )
+                        target.relation_tags_many[comps.DamagedBy].add(e)
+                u.apply_item(item, target, duration=dur, potency=pot)
+        item.clear()
+        e.components[comps.Actor].energy -= 100
+        write_log(
+            w,
+            "item",
+            "{} uses {} on {}",
+            user_name,
+            item_name,
+            target_name,
+        )
+        e.components.pop(comps.UseItemOn)
+
+
+def check_deaths(w: World, ticks: int = 1):
+    for e in q.entity_table(w).fallen():
+        u.add_msg_about(e, "<entity> has fallen!")
+        for killer in q.xp_list(e):
+            u.gain_xp(killer, e)
+        u.kill(e)
+        e.relation_tags_many[comps.DamagedBy].clear()
+
+
+def update_energy(w: World, ticks: int = 1):
+    sched = q.schedule(w)
+    stunned = [e for e in q.affected(w) if "Stunned" in e.components[comps.Effects]]
+    for e in stunned:
+        write_log(w, "energy", "{} is stunned; no energy", e)
+
+    q.entity_table(w).gain_energy(ticks, stunned)
+    sched.advance(ticks)
+
+    if log_enabled("energy"):
+        for e in sched.actors:
+            act_comp = e.components[comps.Actor]
+            write_log(
+                w,
+                "energy",
+                "{} has {} energy after {} tick(s)",
+                e,
+                act_comp.energy,
+                ticks,
+            )
+
+
+def end_turn(w: World, ticks: int = 1):
+    sentinel = w[None].components[comps.GameTicks]
+    if sentinel == UPKEEP_TICK:
+        for e in q.turn_order(w, q.affected(w)):
+            u.tick_effects(e, 1)
+        w[None].components[comps.GameTicks] = 0
+        w[None].components[comps.GameTurn] += 1
+        write_log(w, "end turn", "Turn ends")
+    else:
+        w[None].components[comps.GameTicks] += ticks
+
+
+def update_fov(w: World, ticks: int = 1):
+    player_loc = q.player(w).components[comps.Location]
+    if q.cur_map(w).update_fov(player_loc.x, player_loc.y, 8):
+        u.mark_dirty(w, ui.Layers.MAP)
+
+
+def turn_systems() -> SystemScheduler:
+    """The world systems of a turn, in the order they run."""
+    sched = SystemScheduler()
+    for system in [
+        System(
+            "update_dmap",
+            update_dmap,
+            Phases.READY,
+            reads=(comps.Location, comps.MapSchedule),
+            writes=(comps.GameMapComp,),
+        ),
+        System(
+            "get_npc_moves",
+            get_npc_moves,
+            Phases.READY,
+            reads=(comps.Location, comps.GameMapComp, comps.MapSchedule),
+            writes=(comps.TryMove,),
+        ),
+        System(
+            "check_moves",
+            check_moves,
+            Phases.READY,
+            reads=(comps.TryMove, comps.GameMapComp, comps.Equipment),
+            writes=(comps.Location, comps.Actor, comps.CollidesWith, comps.HeldBy),
+            needs=q.trying_to_move,
+        ),
+        System(
+            "check_collisions",
+            check_collisions,
+            Phases.READY,
+            reads=(comps.CollidesWith,),
+            writes=(comps.BumpAttacking, comps.Actor),
+            needs=q.collisions,
+        ),
+        System(
+            "resolve_bumps",
+            resolve_bumps,
+            Phases.READY,
+            reads=(comps.BumpAttacking, comps.Combatant, comps.Equipment),
+            writes=(comps.Combatant, comps.Equipment, comps.CheckOnHits, comps.Actor),
+            needs=q.bumpers,
+        ),
+        System(
+            "check_on_hits",
+            check_on_hits,
+            Phases.READY,
+            reads=(comps.CheckOnHits, comps.OnHit),
+            writes=(comps.Effects,),
+            needs=q.on_hits,
+        ),
+        System(
+            "check_item_users",
+            check_item_users,
+            Phases.READY,
+            reads=(comps.UseItemOn, comps.Item, comps.Combatant),
+            writes=(comps.Effects, comps.Combatant, comps.Actor),
+            needs=q.trying_to_use_item,
+        ),
+        System(
+            "check_deaths",
+            check_deaths,
+            reads=(comps.Combatant, comps.DamagedBy),
+            writes=(comps.Level, comps.Renderable),
+        ),
+        System(
+            "update_energy",
+            update_energy,
+            reads=(comps.Effects, comps.MapSchedule),
+            writes=(comps.Actor, comps.MapSchedule),
+        ),
+        System(
+            "end_turn",
+            end_turn,
+            reads=(comps.GameTicks, comps.Effects),
+            writes=(comps.GameTicks, comps.GameTurn, comps.Effects),
+        ),
+        System(
+            "update_fov",
+            update_fov,
+            reads=(comps.Location, comps.GameMapComp),
+            writes=(comps.GameMapComp, comps.DirtyLayers),
+        ),
+    ]:
+        sched.register(system)
+    return sched
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Game data is loaded relative to the repository root when factory is imported.
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from engine import Engine  # noqa: E402
+from screen import ScreenNames  # noqa: E402
+
+
+@pytest.fixture
+def engine() -> Engine:
+    """A headless engine with a seeded new game on the main screen."""
+    engine = Engine(headless=True)
+    engine.prefetcher.workers = 0
+    engine.setup()
+    engine.new_game("rikkas", seed=1)
+    engine.switch_screen(ScreenNames.MAIN)
+    yield engine
+    engine.shutdown()
@@ -0,0 +1,24 @@
+from tcod.ecs import World
+
+import components as comps
+from columns import EntityTable
+from geom import Point
+
+
+def test_bound_components_compare_and_repr_live_values():
+    table = EntityTable()
+    bound = comps.Actor(0, 10)
+    table.add(World().new_entity(), Point(1, 1), [bound])
+
+    bound.energy = 50
+
+    assert bound == comps.Actor(50, 10)
+    assert bound != comps.Actor(0, 10)
+    assert repr(bound) == "Actor(energy=50, speed=10)"
+
+
+def test_unbound_components_compare_fields():
+    sprite = comps.Renderable("@", (255, 255, 255))
+    assert sprite == comps.Renderable("@", (255, 255, 255), 4)
+    assert sprite != comps.Renderable("k", (255, 255, 255))
+    assert repr(sprite) == "Renderable(glyph='@', color=(255, 255, 255), z=4)"
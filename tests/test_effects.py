@@ -0,0 +1,39 @@
+import pytest
+from tcod.ecs import Entity
+
+import components as comps
+import effects
+import queries as q
+import updates as u
+
+
+@pytest.fixture
+def player(engine) -> Entity:
+    return engine.world["player"]
+
+
+def test_affected(engine, player):
+    w = engine.world
+    assert player not in list(q.affected(w))
+
+    u.apply_effect(player, effects.StunnedEffect(2))
+    assert player in list(q.affected(w))
+    assert player in list(q.affected(w, "town"))
+
+    u.tick_effects(player, 1)
+    assert player in list(q.affected(w))
+
+    u.tick_effects(player, 1)
+    assert player not in list(q.affected(w))
+    assert comps.HasEffects not in player.tags
+
+
+def test_affected_keeps_other_effects(engine, player):
+    w = engine.world
+    u.apply_effect(player, effects.StunnedEffect(1))
+    u.apply_effect(player, effects.PoisonEffect(3, 0))
+
+    u.tick_effects(player, 1)
+
+    assert "Stunned" not in player.components[comps.Effects]
+    assert player in list(q.affected(w))
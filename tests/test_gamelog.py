@@ -0,0 +1,54 @@
+import time
+
+from gamelog import GameLog
+
+
+def _blocked_path(tmp_path) -> str:
+    """A log path whose directory is a file, so it can't be opened."""
+    (tmp_path / "logs").write_text("")
+    return str(tmp_path / "logs" / "game.log")
+
+
+def test_failed_flush_keeps_lines(tmp_path):
+    log = GameLog(capacity=8, interval=60)
+    ok_path = str(tmp_path / "ok.log")
+    bad_path = _blocked_path(tmp_path)
+    log.write(bad_path, "kept\n")
+    log.write(ok_path, "written\n")
+
+    log.flush()
+
+    assert open(ok_path).read() == "written\n"
+    (tmp_path / "logs").unlink()
+    (tmp_path / "logs").mkdir()
+    log.flush()
+    assert open(bad_path).read() == "kept\n"
+
+
+def test_failed_flush_keeps_at_most_capacity(tmp_path):
+    log = GameLog(capacity=4, interval=60)
+    bad_path = _blocked_path(tmp_path)
+    for i in range(7):
+        log.write(bad_path, f"{i}\n")
+
+    log.flush()
+    (tmp_path / "logs").unlink()
+    (tmp_path / "logs").mkdir()
+    log.flush()
+
+    assert open(bad_path).read() == "3\n4\n5\n6\n"
+
+
+def test_writer_survives_failed_flush(tmp_path):
+    log = GameLog(capacity=1, interval=0.01)
+    bad_path = _blocked_path(tmp_path)
+    log.write(bad_path, "lost\n")
+    time.sleep(0.05)
+
+    ok_path = str(tmp_path / "ok.log")
+    log.write(ok_path, "later\n")
+    for _ in range(100):
+        time.sleep(0.01)
+        if (tmp_path / "ok.log").exists():
+            break
+    assert open(ok_path).read() == "later\n"
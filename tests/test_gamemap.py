@@ -0,0 +1,28 @@
+from random import Random
+
+import numpy as np
+import pytest
+
+from gamemap import GameMap, drunk_walk
+
+
+def _carved(m: GameMap) -> np.ndarray:
+    return m.tiles["walkable"]
+
+
+@pytest.mark.parametrize("size, coverage", [(30, 0.5), (80, 0.6), (12, 0.6)])
+def test_fast_walk_carves_like_classic(size, coverage):
+    classic = drunk_walk("m", "M", size, size, coverage, rng=Random(5))
+    fast = drunk_walk("m", "M", size, size, coverage, fast=True, rng=Random(5))
+
+    assert np.count_nonzero(_carved(fast)) == np.count_nonzero(_carved(classic))
+
+
+@pytest.mark.parametrize("fast", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_walk_never_carves_the_edge(fast, seed):
+    m = drunk_walk("m", "M", 24, 16, 0.75, fast=fast, rng=Random(seed))
+    carved = _carved(m)
+
+    assert not carved[0, :].any() and not carved[-1, :].any()
+    assert not carved[:, 0].any() and not carved[:, -1].any()
@@ -0,0 +1,56 @@
+import os
+
+from engine import Engine
+from screen import ScreenNames
+
+import components as comps
+import gamelog
+import headless
+import queries as q
+import updates as u
+
+
+def _god_mode(engine: Engine):
+    player = engine.world["player"]
+    player.components[comps.Combatant].base_max_hp = 1_000_000
+    player.components[comps.Combatant].heal()
+    u.invalidate_stats(player)
+
+
+def _play(seed: int, turns: int) -> tuple:
+    engine = Engine(headless=True)
+    engine.prefetcher.workers = 0
+    engine.setup()
+    engine.new_game("rikkas", seed)
+    engine.switch_screen(ScreenNames.MAIN)
+    _god_mode(engine)
+    headless.play(engine, turns, seed)
+    w = engine.world
+    player = w["player"]
+    result = (
+        w[None].components[comps.GameTurn],
+        q.cur_map(w).id,
+        q.location(player),
+        player.components[comps.Combatant].cur_hp,
+        len(q.messages(w)),
+    )
+    engine.shutdown()
+    return result
+
+
+def test_headless_writes_nothing(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(gamelog, "DEBUG", True)
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("logs")
+    _god_mode(engine)
+
+    assert headless.play(engine, 300, seed=1) == 300
+    engine.shutdown()
+    gamelog.GAMELOG.flush()
+
+    assert os.listdir(tmp_path) == ["logs"]
+    assert os.listdir(tmp_path / "logs") == []
+
+
+def test_same_seed_same_game():
+    assert _play(7, 400) == _play(7, 400) == _play(7, 400)
@@ -0,0 +1,109 @@
+import pytest
+
+import components as comps
+import gamelog as gl
+import queries as q
+import savefile
+from constants import VERSION
+from savefile import HEADER_LEN, SAVE_MAGIC, read_save, read_save_info, write_save
+
+
+@pytest.fixture
+def save_path(engine, tmp_path) -> str:
+    path = str(tmp_path / "game.sav")
+    write_save(engine.world, path)
+    return path
+
+
+def _write(tmp_path, data: bytes) -> str:
+    path = str(tmp_path / "bad.sav")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_header(save_path):
+    info = read_save_info(save_path)
+    assert info.path == save_path
+    assert info.name == "Rikkas"
+    assert info.version == VERSION
+    assert not info.dead
+    assert not info.winner
+
+
+def test_round_trip(engine, save_path):
+    w = read_save(save_path)
+    player, saved = w["player"], engine.world["player"]
+    assert q.name(player) == q.name(saved)
+    assert q.location(player) == q.location(saved)
+    assert q.stats(player) == q.stats(saved)
+    assert w[None].components[comps.GameTurn] == 0
+
+    m, saved_m = q.cur_map(w), q.cur_map(engine.world)
+    assert m.id == saved_m.id
+    assert (m.tiles == saved_m.tiles).all()
+    assert m.spatial.location(player) == q.location(player)
+
+
+def test_truncated(save_path, tmp_path):
+    with open(save_path, "rb") as f:
+        data = f.read()
+    header_end = len(SAVE_MAGIC) + HEADER_LEN.size
+    header_end += HEADER_LEN.unpack(data[len(SAVE_MAGIC) : header_end])[0]
+
+    for size in [0, 5, len(SAVE_MAGIC), len(SAVE_MAGIC) + 1, header_end - 1]:
+        path = _write(tmp_path, data[:size])
+        with pytest.raises(ValueError):
+            read_save_info(path)
+        with pytest.raises(ValueError):
+            read_save(path)
+
+    path = _write(tmp_path, data[: (header_end + len(data)) // 2])
+    assert read_save_info(path).name == "Rikkas"
+    with pytest.raises(ValueError):
+        read_save(path)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"not a save file at all",
+        SAVE_MAGIC + b"\x00",
+        SAVE_MAGIC + HEADER_LEN.pack(2) + b"{}",
+        SAVE_MAGIC + HEADER_LEN.pack(2) + b"[]",
+        SAVE_MAGIC + HEADER_LEN.pack(4) + b"\xff\xfe{}",
+    ],
+)
+def test_garbage_header(tmp_path, data: bytes):
+    path = _write(tmp_path, data)
+    with pytest.raises(ValueError):
+        read_save_info(path)
+
+
+def test_garbage_body(save_path, tmp_path):
+    info = read_save_info(save_path)
+    with open(save_path, "rb") as f:
+        header = f.read(len(SAVE_MAGIC) + HEADER_LEN.size)
+        header += f.read(HEADER_LEN.unpack(header[len(SAVE_MAGIC) :])[0])
+
+    path = _write(tmp_path, header + b"garbage")
+    assert read_save_info(path).name == info.name
+    with pytest.raises(ValueError):
+        read_save(path)
+
+
+def test_failed_autosave_is_logged(engine, tmp_path, monkeypatch):
+    logged = list()
+    monkeypatch.setattr(
+        savefile.gl, "write_log", lambda w, *args, **kw: logged.append(kw["level"])
+    )
+    autosaver = savefile.Autosaver()
+
+    assert autosaver.save(engine.world, str(tmp_path / "missing" / "game.sav"))
+    autosaver.wait(engine.world)
+    assert logged == [gl.LogLevels.WARNING]
+
+    path = str(tmp_path / "game.sav")
+    assert autosaver.save(engine.world, path)
+    autosaver.wait(engine.world)
+    assert read_save_info(path).name == "Rikkas"
@@ -0,0 +1,58 @@
+from tcod.ecs import World
+
+import components as comps
+from schedule import TurnSchedule
+
+
+def _schedule(*speeds: int):
+    w = World()
+    sched = TurnSchedule()
+    actors = dict()
+    for speed in speeds:
+        e = w.new_entity()
+        actors[e] = comps.Actor(-100, speed)
+        sched.add(e, actors[e])
+    return sched, actors
+
+
+def _advance(sched: TurnSchedule, actors: dict, ticks: int):
+    for act in actors.values():
+        act.energy += act.speed * ticks
+    sched.advance(ticks)
+
+
+def test_actors_slowest_first():
+    sched, actors = _schedule(20, 30, 10)
+    speeds = [actors[e].speed for e in sched.actors]
+    assert speeds == [10, 20, 30]
+
+
+def test_fastest_is_ready_first():
+    sched, actors = _schedule(10, 20, 30)
+    _, mid, fast = actors
+
+    assert sched.ticks_until_ready() == 4
+    _advance(sched, actors, 4)
+    assert sched.ticks_until_ready() == 0
+    assert sched.ready() == [fast]
+
+    actors[fast].energy -= 100
+    assert sched.ticks_until_ready() == 1
+    _advance(sched, actors, 1)
+    assert sched.ready() == [mid]
+
+
+def test_removed_actor_is_not_scheduled():
+    sched, actors = _schedule(10, 30)
+    slow, fast = actors
+
+    sched.remove(fast)
+
+    assert fast not in sched
+    assert sched.actors == [slow]
+    assert sched.ticks_until_ready() == 10
+
+
+def test_actor_without_speed_never_acts():
+    sched, _ = _schedule(0)
+    assert sched.ticks_until_ready() is None
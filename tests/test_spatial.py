@@ -0,0 +1,90 @@
+from tcod.ecs import Entity, World
+
+import components as comps
+import factory as fac
+import headless
+import queries as q
+import updates as u
+
+
+def assert_indexed(w: World):
+    """Every entity on a map is filed in its index at its location, and no more."""
+    placed: dict[str, int] = dict()
+    for e in w.Q.all_of(components=[comps.Location], relations=[(comps.MapId, ...)]):
+        m = q.map_of(e)
+        assert m.spatial.location(e) == e.components[comps.Location]
+        assert e in m.spatial.at(e.components[comps.Location])
+        placed[m.id] = placed.get(m.id, 0) + 1
+
+    for m_e in w.Q.all_of(components=[comps.GameMapComp]):
+        m = m_e.components[comps.GameMapComp]
+        assert len(m.spatial) == placed.get(m.id, 0)
+
+
+def _free_floor_next_to(e: Entity):
+    m = q.map_of(e)
+    pos = q.location(e)
+    for pt in m.neighbors(pos.x, pos.y):
+        if m.walkable(pt.x, pt.y) and not m.spatial.is_blocked(pt):
+            return pt
+    return m.sample_floors(1, m.spatial.occupied())[0]
+
+
+def test_new_game_is_indexed(engine):
+    assert_indexed(engine.world)
+
+
+def test_move_entity(engine):
+    player = engine.world["player"]
+    m = q.map_of(player)
+    old = q.location(player)
+    new = _free_floor_next_to(player)
+
+    u.move_entity(player, new)
+
+    assert m.spatial.location(player) == new
+    assert player in m.spatial.blockers_at(new)
+    assert player not in m.spatial.at(old)
+    assert_indexed(engine.world)
+
+
+def test_change_map(engine):
+    w = engine.world
+    player = w["player"]
+    town = q.map_of(player)
+    down_id, _ = q.map_connections(w, town.id)["down"]
+
+    fac.descend(player, down_id)
+
+    below = q.map_of(player)
+    conn = w[town.id].relation_components[comps.MapConnection][w[down_id]]
+    assert below.id == down_id
+    assert player not in town.spatial
+    assert player not in q.schedule(w, town.id)
+    assert below.spatial.location(player) == conn.up_stair
+    assert player in q.schedule(w, down_id)
+    assert_indexed(w)
+
+
+def test_remove_from_map(engine):
+    w = engine.world
+    player = w["player"]
+    m = q.map_of(player)
+    pos = q.location(player)
+
+    u.remove_from_map(player)
+
+    assert player not in m.spatial
+    assert player not in m.spatial.at(pos)
+    assert player not in q.schedule(w, m.id)
+
+
+def test_index_holds_through_play(engine):
+    player = engine.world["player"]
+    player.components[comps.Combatant].base_max_hp = 1_000_000
+    player.components[comps.Combatant].heal()
+    u.invalidate_stats(player)
+
+    assert headless.play(engine, 500, seed=1) == 500
+    assert q.cur_map(engine.world).id != "town"
+    assert_indexed(engine.world)
@@ -0,0 +1,81 @@
+import pytest
+from tcod.ecs import Entity
+
+import components as comps
+import effects
+import factory as fac
+import queries as q
+import updates as u
+
+
+@pytest.fixture
+def player(engine) -> Entity:
+    player = engine.world["player"]
+    q.stats(player)
+    return player
+
+
+@pytest.fixture
+def sword(engine, player) -> Entity:
+    sword = fac.make_equipment(engine.world, "sword_iron")
+    fac.place_entity(engine.world, sword, "town", q.location(player))
+    u.add_to_inventory(sword, player)
+    return sword
+
+
+def assert_invalidated(e: Entity):
+    assert comps.EffectiveStatsComp not in e.components
+    assert q.stats(e) == q.derive_stats(e)
+
+
+def test_stats_are_cached(player):
+    assert player.components[comps.EffectiveStatsComp] is q.stats(player)
+
+
+def test_equip_and_unequip(player, sword):
+    before = q.stats(player)
+
+    u.equip_item(sword, player)
+    assert_invalidated(player)
+    assert q.stats(player).atp == before.atp + 5
+    assert q.stats(player).dfp == before.dfp + 5
+
+    u.unequip_item(sword, player)
+    assert_invalidated(player)
+    assert q.stats(player) == before
+
+
+def test_gain_levels(player):
+    before = q.stats(player)
+
+    u.gain_levels(player, 1)
+
+    assert_invalidated(player)
+    assert q.stats(player).max_hp > before.max_hp
+    assert q.stats(player).atp > before.atp
+
+
+@pytest.mark.parametrize(
+    "eff",
+    [
+        lambda: effects.StunnedEffect(2),
+        lambda: effects.PoisonEffect(2, 0),
+        lambda: effects.BleedEffect(2, 0),
+    ],
+)
+def test_effect_changes(player, eff):
+    u.apply_effect(player, eff())
+    assert_invalidated(player)
+
+    u.apply_effect(player, eff())
+    assert_invalidated(player)
+
+    u.tick_effects(player, 1)
+    q.stats(player)
+    u.tick_effects(player, 1)
+    assert_invalidated(player)
+
+    u.apply_effect(player, eff())
+    q.stats(player)
+    u.remove_effect(player, eff().name)
+    assert_invalidated(player)
@@ -0,0 +1,97 @@
+import pytest
+from tcod.ecs import World
+
+from constants import UPKEEP_TICK
+from engine import Engine
+
+import components as comps
+import effects
+import queries as q
+import systems as sy
+import updates as u
+
+
+def _noop(w, ticks: int = 1):
+    pass
+
+
+def test_register_before_keeps_order():
+    sched = sy.turn_systems()
+    sched.register(sy.System("extra", _noop, reads=(comps.GameTurn,)), "update_fov")
+
+    names = [s.name for s in sched]
+    assert names.index("end_turn") < names.index("extra") < names.index("update_fov")
+
+
+def test_register_before_a_writer_of_its_reads():
+    sched = sy.turn_systems()
+    stale = sy.System("stale", _noop, reads=(comps.GameTurn, comps.Location))
+
+    with pytest.raises(ValueError, match="game_turn, written by end_turn"):
+        sched.register(stale, before="end_turn")
+    assert "stale" not in [s.name for s in sched]
+
+
+def _waiting_game(seed: int) -> Engine:
+    """A new game where the player has to wait out a stun before acting."""
+    engine = Engine(headless=True)
+    engine.prefetcher.workers = 0
+    engine.setup()
+    engine.new_game("rikkas", seed)
+    player = engine.world["player"]
+    player.components[comps.Actor].energy = -500
+    u.apply_effect(player, effects.StunnedEffect(3))
+    u.apply_effect(player, effects.PoisonEffect(7, 0))
+    return engine
+
+
+def _state(w: World) -> tuple:
+    player = w["player"]
+    return (
+        w[None].components[comps.GameTicks],
+        w[None].components[comps.GameTurn],
+        q.schedule(w).clock,
+        [(q.name(e), e.components[comps.Actor].energy) for e in q.schedule(w).actors],
+        [str(eff) for eff in player.components[comps.Effects]],
+    )
+
+
+def _wait(engine: Engine, turns: int) -> list[tuple]:
+    """The state each time a game turn ends, for the given number of turns."""
+    w = engine.world
+    states = list()
+    loops = 0
+
+    def turn_ended(w: World) -> bool:
+        nonlocal loops
+        loops += 1
+        if w[None].components[comps.GameTicks] == 0:
+            states.append(_state(w))
+        return len(states) == turns or loops == 100 * turns
+
+    sy.turn_systems().run(w, turn_ended)
+    engine.shutdown()
+    return states
+
+
+def test_idle_ticks_stop_at_upkeep():
+    w = World()
+    w[None].components[comps.GameTicks] = UPKEEP_TICK - 3
+    assert sy.idle_ticks(w, 0) == 1
+    assert sy.idle_ticks(w, 2) == 2
+    assert sy.idle_ticks(w, 10) == 3
+    assert sy.idle_ticks(w, None) == 3
+
+    w[None].components[comps.GameTicks] = UPKEEP_TICK
+    assert sy.idle_ticks(w, 10) == 1
+
+
+def test_batched_ticks_match_single_ticks(monkeypatch):
+    batched = _wait(_waiting_game(3), 10)
+    monkeypatch.setattr(sy, "idle_ticks", lambda w, until_ready: 1)
+    single = _wait(_waiting_game(3), 10)
+
+    assert len(batched) == 10
+    assert batched == single
+    assert batched[2][4] == ["Poison(4 t)"]
+    assert batched[-1][4] == []
@@ -1,11 +1,13 @@
-from gamemap import GameMap, SHROUD
+from gamemap import GameMap
 from geom import Point
 from tcod.console import Console
 from typing import Tuple
 from tcod.ecs import World
-from queries import messages
+from columns import EntityTable
+from profiler import Profiler
 
 import numpy as np
+import queries as q
 import textwrap
 import swatch as sw
 
@@ -17,6 +19,16 @@ MSG_W = MAP_W
 MSG_H = 10
 
 
+class Layers:
+    """Cached parts of the main screen, redrawn only when marked dirty."""
+
+    MAP = "map"
+    ENTITIES = "entities"
+    SIDEBAR = "sidebar"
+    MESSAGES = "messages"
+    ALL = (MAP, ENTITIES, SIDEBAR, MESSAGES)
+
+
 class Camera:
     """Defines a viewport for the visible map."""
 
@@ -60,32 +72,50 @@ def draw_on_map(
             cell["fg"] = fg
 
 
+def draw_entities(m: GameMap, table: EntityTable, cam: Camera, con: Console):
+    """Blits every renderable on the map in one pass, highest z on top."""
+    rows = table.render_rows()
+    st = cam.start_point(m)
+    xs = table.cols["x"][rows]
+    ys = table.cols["y"][rows]
+    sx = xs - st.x
+    sy = ys - st.y
+    show = (sx >= 0) & (sx < cam.width) & (sy >= 0) & (sy < cam.height)
+    if m.dark:
+        show &= m.visible[xs, ys]
+    rows, sx, sy = rows[show], sx[show], sy[show]
+
+    # Keep only the last (highest z) entity drawn on each cell
+    cells = np.ravel_multi_index((sx, sy), (cam.width, cam.height))
+    _, last = np.unique(cells[::-1], return_index=True)
+    keep = len(cells) - 1 - last
+    rows, sx, sy = rows[keep], sx[keep], sy[keep]
+
+    color = table.cols["color"][rows]
+    view = con.rgb[sx, sy]
+    view["ch"] = table.cols["glyph"][rows]
+    view["fg"] = np.stack([color >> 16, color >> 8, color], axis=-1) & 0xFF
+    con.rgb[sx, sy] = view
+
+
 def draw_map(m: GameMap, cam: Camera, con: Console):
     st = cam.start_point(m)
     x_end = st.x + min(m.width, cam.width)
     y_end = st.y + min(m.height, cam.height)
     s_xend = x_end - st.x
     s_yend = y_end - st.y
-    viewport = m.tiles[st.x : x_end, st.y : y_end]
-    vw_visible = m.visible[st.x : x_end, st.y : y_end]
-    vw_explored = m.explored[st.x : x_end, st.y : y_end]
-
-    con.rgb[0:s_xend, 0:s_yend] = np.select(
-        condlist=[(not m.dark) or vw_visible, vw_explored],
-        choicelist=[viewport["light"], viewport["dark"]],
-        default=SHROUD,
-    )
+    con.rgb[0:s_xend, 0:s_yend] = m.render[st.x : x_end, st.y : y_end]
 
 
 def draw_msgs(w: World, con: Console):
     con.draw_frame(0, MAP_H, MSG_W, MSG_H, title="Messages")
     counter = 0
-    for msg in messages(w)[::-1]:
-        if measure(msg.message, MSG_W - 2) + counter >= MSG_H - 1:
+    for msg, lines in q.messages(w).latest():
+        if len(lines) + counter >= MSG_H - 1:
             break
-        counter += con.print_box(
-            1, MAP_H + counter + 1, MSG_W - 2, MSG_H - 2, msg.message, msg.color
-        )
+        for line in lines:
+            con.print(1, MAP_H + counter + 1, line, msg.color)
+            counter += 1
 
 
 def draw_dmap(m: GameMap, cam: Camera, con: Console):
@@ -99,6 +129,28 @@ def draw_dmap(m: GameMap, cam: Camera, con: Console):
                 draw_on_map(x, y, str(d), cam, con, m)
 
 
+def _ms(ms: float) -> str:
+    return f"{ms:5.2f}" if ms < 10 else f"{ms:5.1f}" if ms < 100 else f"{ms:5.0f}"
+
+
+def draw_profile(prof: Profiler, con: Console):
+    """
+    Overlays recent timings: mean, 95th percentile and max in ms, then a
+    shaded histogram of calls from the fastest bucket to the slowest.
+    """
+    rows = prof.rows()[: SCR_H - 3]
+    con.draw_frame(0, 0, SCR_W, len(rows) + 3, "Profile (ms)", fg=sw.WHITE, bg=sw.BLACK)
+    con.print(1, 1, f"{'':<14} mean  p95  max hist", sw.CAUTION)
+    shades = " \u2591\u2592\u2593\u2588"
+    for y, (name, hist) in enumerate(rows, 2):
+        counts = hist.buckets()
+        peak = max(counts.max(), 1)
+        bars = "".join(shades[-(-c * (len(shades) - 1) // peak)] for c in counts)
+        label = name.split(".", 1)[-1][:14]
+        stats = "".join(_ms(ms) for ms in (hist.mean, hist.percentile(95), hist.max))
+        con.print(1, y, f"{label:<14}{stats} {bars}")
+
+
 def draw_bar(
     x: int,
     y: int,
@@ -122,10 +174,6 @@ def draw_bar(
             con.print(sx + x, y, s)
 
 
-def measure(text: str, w: int) -> int:
-    return len(textwrap.wrap(text, w))
-
-
 class UIElement:
     """Base UI element class."""
 
@@ -9,6 +9,7 @@ from typing import Any
 
 import components as comps
 import queries as q
+import ui
 import effects as eff
 
 
@@ -18,18 +19,29 @@ def kill(e: Entity):
     render.z = 2
     e.tags.add("dead")
     e.tags.remove("blocker")
+    m = q.map_of(e)
+    if m:
+        m.spatial.refresh(e)
+        q.schedule(e.world, m.id).remove(e)
+        q.entity_table(e.world, m.id).add(e, e.components[comps.Location], [render])
+        mark_dirty(e.world, ui.Layers.ENTITIES)
     if comps.TryMove in e.components:
         e.components.pop(comps.TryMove)
     if comps.CollidesWith in e.components:
         e.components.pop(comps.CollidesWith)
     for item in q.inventory(e):
         drop_item(item, e)
-    write_log(e.world, "kill", f"{q.name(e)} dies")
+    write_log(e.world, "kill", "{} dies", e)
+
+
+def mark_dirty(w: World, *layers: str):
+    q.dirty_layers(w).update(layers)
 
 
 def add_msg(w: World, txt: str, fg: tuple[int, int, int] = WHITE):
     new_msg = comps.GameMessage(txt, fg)
     w[None].components[comps.Messages].append(new_msg)
+    mark_dirty(w, ui.Layers.MESSAGES)
 
 
 def add_msg_about(e: Entity, txt: str):
@@ -39,34 +51,49 @@ def add_msg_about(e: Entity, txt: str):
     add_msg(e.world, r, color)
 
 
+def invalidate_stats(e: Entity):
+    """Drops e's cached stats, to be derived again on the next read."""
+    e.components.pop(comps.EffectiveStatsComp, None)
+
+
 def apply_effect(e: Entity, eff: eff.GameEffect):
+    invalidate_stats(e)
     maybe_eff = q.find_effect(e, eff.name)
     if maybe_eff:
         maybe_eff.on_merge(eff)
-        write_log(e.world, "effect", f"Merging existing {eff.name} on {q.name(e)}")
+        write_log(e.world, "effect", "Merging existing {} on {}", eff.name, e)
         return
 
-    e.components[comps.EffectsList].append(eff)
+    e.components[comps.Effects].add(eff)
+    e.tags.add(comps.HasEffects)
     eff.on_apply(e)
-    write_log(e.world, "effect", f"Applying new {eff.name} effect to {q.name(e)}")
+    write_log(e.world, "effect", "Applying new {} effect to {}", eff.name, e)
 
 
 def tick_effects(e: Entity, num_ticks: int):
-    for ef in e.components[comps.EffectsList]:
+    for ef in list(e.components[comps.Effects]):
         ef.tick(e, num_ticks)
         if ef.expired:
             remove_effect(e, ef.name)
         write_log(
-            e.world, "upkeep", f"Ticking effect {ef.name} on {q.name(e)} ({num_ticks})"
+            e.world,
+            "upkeep",
+            "Ticking effect {} on {} ({})",
+            ef.name,
+            e,
+            num_ticks,
         )
 
 
 def remove_effect(e: Entity, eff_name: str):
-    maybe_eff = q.find_effect(e, eff_name)
+    fx = e.components[comps.Effects]
+    maybe_eff = fx.remove(eff_name)
     if maybe_eff:
+        invalidate_stats(e)
+        if not fx:
+            e.tags.discard(comps.HasEffects)
         maybe_eff.on_remove(e)
-        e.components[comps.EffectsList].remove(maybe_eff)
-        write_log(e.world, "effect", f"Removing effect {maybe_eff} from {q.name(e)}")
+        write_log(e.world, "effect", "Removing effect {} from {}", maybe_eff, e)
 
 
 def rename(e: Entity, new_name: str):
@@ -74,6 +101,7 @@ def rename(e: Entity, new_name: str):
 
 
 def add_to_inventory(item: Entity, holder: Entity):
+    remove_from_map(item)
     item.relation_tag[comps.HeldBy] = holder
     item.components.pop(comps.Location)
 
@@ -87,7 +115,7 @@ def pick_up_item(item: Entity, holder: Entity) -> bool:
         add_to_inventory(item, holder)
         if q.is_visible(holder):
             add_msg_about(holder, f"<entity> picks up {item_name}")
-        write_log(item.world, "inventory", f"{holder_name} picks up {item_name}")
+        write_log(item.world, "inventory", "{} picks up {}", holder_name, item_name)
         return True
     else:
         if q.is_player(holder):
@@ -95,7 +123,9 @@ def pick_up_item(item: Entity, holder: Entity) -> bool:
         write_log(
             item.world,
             "inventory",
-            f"{holder_name} can't pick up {item_name}, inventory full",
+            "{} can't pick up {}, inventory full",
+            holder_name,
+            item_name,
         )
 
     return False
@@ -104,10 +134,10 @@ def pick_up_item(item: Entity, holder: Entity) -> bool:
 def drop_item(item: Entity, holder: Entity):
     pos = holder.components[comps.Location]
     item.relation_tag.pop(comps.HeldBy)
-    item.components[comps.Location] = pos
+    change_map(item, holder.relation_tag[comps.MapId].uid, pos)
     if item in q.get_equipped(holder):
         unequip_item(item, holder)
-    write_log(item.world, "inventory", f"{q.name(holder)} drops {q.name(item)}")
+    write_log(item.world, "inventory", "{} drops {}", holder, item)
 
 
 def apply_item(
@@ -124,20 +154,24 @@ def apply_item(
     }
 
     ef = applicators[item_comp.item_effect]
-    write_log(item.world, "item", f"{q.name(item)} used on {q.name(target)}")
+    write_log(item.world, "item", "{} used on {}", item, target)
     apply_effect(target, ef)
 
 
 def _eq_item(item: Entity, tag: Any, wielder: Entity):
     wielder.relation_tag[tag] = item
     wielder.relation_tags_many[comps.Equipped].add(item)
-    write_log(wielder.world, "equip", f"{q.name(wielder)} equips {q.name(item)}")
+    invalidate_stats(wielder)
+    mark_dirty(wielder.world, ui.Layers.SIDEBAR)
+    write_log(wielder.world, "equip", "{} equips {}", wielder, item)
 
 
 def _uneq_item(item: Entity, tag: Any, wielder: Entity):
     wielder.relation_tag.pop(tag)
     wielder.relation_tags_many[comps.Equipped].discard(item)
-    write_log(wielder.world, "equip", f"{q.name(wielder)} unequips {q.name(item)}")
+    invalidate_stats(wielder)
+    mark_dirty(wielder.world, ui.Layers.SIDEBAR)
+    write_log(wielder.world, "equip", "{} unequips {}", wielder, item)
 
 
 def unequip_item(item: Entity, wielder: Entity):
@@ -174,8 +208,36 @@ def equip_item(item: Entity, wielder: Entity):
 
 
 def change_map(e: Entity, map_id: str, pt: Point):
+    remove_from_map(e)
     e.relation_tag[comps.MapId] = e.world[map_id]
     e.components[comps.Location] = pt
+    q.map_of(e).spatial.add(e, pt)
+    views = [e.components.get(comps.Renderable)]
+    if comps.Actor in e.components and not q.is_dead(e):
+        act = e.components[comps.Actor]
+        views += [act, e.components.get(comps.Combatant)]
+        q.schedule(e.world, map_id).add(e, act)
+    if views[0] is not None:
+        q.entity_table(e.world, map_id).add(e, pt, views)
+    mark_dirty(e.world, ui.Layers.ENTITIES)
+
+
+def move_entity(e: Entity, pt: Point):
+    e.components[comps.Location] = pt
+    m = q.map_of(e)
+    if m:
+        m.spatial.move(e, pt)
+        q.entity_table(e.world, m.id).move(e, pt)
+        mark_dirty(e.world, ui.Layers.ENTITIES)
+
+
+def remove_from_map(e: Entity):
+    m = q.map_of(e)
+    if m:
+        m.spatial.remove(e)
+        q.schedule(e.world, m.id).remove(e)
+        q.entity_table(e.world, m.id).remove(e)
+        mark_dirty(e.world, ui.Layers.ENTITIES)
 
 
 def gain_xp(e: Entity, victim: Entity):
@@ -191,7 +253,7 @@ def gain_xp(e: Entity, victim: Entity):
 
     lvl.xp += xp
     maybe_lvl = q.check_gain_levels(e)
-    write_log(e.world, "xp", f"{q.name(e)} gains {xp} xp from {q.name(victim)}")
+    write_log(e.world, "xp", "{} gains {} xp from {}", e, xp, victim)
     if maybe_lvl > 0:
         gain_levels(e, maybe_lvl)
 
@@ -212,5 +274,6 @@ def gain_levels(e: Entity, lvls: int):
         maybe_fight.df += 5
 
     maybe_lvl.level += lvls
+    invalidate_stats(e)
     add_msg_about(e, f"<entity> gains {lvls} level{('s' if lvls > 1 else '')}!")
-    write_log(e.world, "xp", f"{q.name(e)} gains {lvls} levels")
+    write_log(e.world, "xp", "{} gains {} levels", e, lvls)